@@ -0,0 +1,372 @@
+"""Benchmarks of the Collision Simulator
+
+Times the hot paths of the Simulator (collisions, motion, selection and
+drawing of Balls) separately, on reproducible scenarios of N Balls:
+
+    python -m bench --sizes 10 100 1000 10000 100000 --output bench.json
+
+Every scenario is seeded, so that runs on different commits time the same
+work, and the results are written as JSON to track regressions between them
+(see --baseline)
+"""
+
+from dataclasses import dataclass
+from generator import Ball
+from typing import Any, Callable
+import collisions
+import generator
+import ccd
+import scenario
+import platform
+import argparse
+import world
+import numpy as np
+import subprocess
+import statistics
+import json
+import time
+import sys
+import os
+
+# pygame is only used for its Vectors (and a hidden window) here
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+
+# Default sizes of the scenarios, number of calls timed and seconds allowed
+# for each operation (at least one call is always timed)
+SIZES: tuple[int] = (10, 100, 1_000, 10_000, 100_000)
+REPEAT: int = 5
+BUDGET: float = 2.0
+SEED: int = 0
+
+# Fraction of the Box covered by Balls in dense and sparse scenarios, and in
+# piles of Balls at rest on the floor (see stack)
+PACKING: dict[str, float] = {"dense": 0.5, "sparse": 0.05, "pile": 0.5}
+
+# Largest speed (in either axis) given to the Balls
+SPEED: float = 200.0
+
+# Modules whose import is timed, in fresh interpreters: the physics alone,
+# and along with the window (which must open nothing before it is used)
+MODULES: tuple[str] = ("generator", "collisions", "physics", "main")
+
+# Slowdown above which an operation is reported as a regression
+TOLERANCE: float = 1.1
+
+
+@dataclass
+class Case:
+    """
+    represents a scenario to be benchmarked
+    attributes:
+        self.packing: 'dense', 'sparse' or 'pile' (see PACKING)
+        self.gravity: whether gravity is ON
+        self.count: number of Balls
+    """
+
+    packing: str
+    gravity: bool
+    count: int
+
+    def __str__(self) -> str:
+        switch = "gravity" if self.gravity else "free"
+        return f"{self.packing}-{switch}-{self.count}"
+
+
+def stack(count: int, radius: float) -> np.ndarray:
+    """returns the positions of count Balls of the given radius, stacked in
+    hexagonal rows (each touching the ones below it) on the floor of the Box,
+    i.e. its side along +y"""
+
+    lower, upper = scenario.LIMITS
+    width = int((upper - lower) // (2*radius))
+    positions, row = [], 0
+    while len(positions) < count:
+        shift, y = row % 2, upper - radius - np.sqrt(3)*radius*row
+        positions.extend(
+            (lower + radius*(1 + shift + 2*column), y)
+            for column in range(width - shift)
+        )
+        row += 1
+    return np.array(positions[:count])
+
+
+def build(case: Case, seed: int = SEED) -> scenario.Scenario:
+    """returns the (seeded) scenario of the given case
+    colors come from generator.color, radii and densities from the values of
+    generator.RADII and generator.DENSITIES, with radii scaled down so that
+    the Balls cover the fraction PACKING[case.packing] of the Box
+    the Balls of piles all have the same radius, and are at rest"""
+
+    rng = np.random.default_rng(seed)
+    generator.seed(seed)
+
+    lower, upper = scenario.LIMITS
+    radii = rng.choice(generator.RADII.values, case.count)
+    densities = rng.choice(generator.DENSITIES.values, case.count)
+    if case.packing == "pile":
+        radii = np.full(case.count, np.sqrt(np.mean(radii**2)))
+
+    area = PACKING[case.packing] * (upper - lower)**2
+    scale = min(1.0, np.sqrt(area / (np.pi * np.sum(radii**2))))
+    radii *= scale
+
+    low, high = lower + radii[:, None], upper - radii[:, None]
+    positions = low + rng.random((case.count, 2)) * (high - low)
+    velocities = rng.uniform(-SPEED, SPEED, (case.count, 2))
+    if case.packing == "pile":
+        positions, velocities = stack(case.count, radii[0]), 0 * velocities
+
+    balls = [
+        Ball(generator.color(), radius, tuple(position), tuple(velocity),
+        density) for radius, position, velocity, density in zip(
+            radii.tolist(), positions.tolist(), velocities.tolist(),
+            densities.tolist()
+        )
+    ]
+    return scenario.Scenario(balls, gravity=case.gravity, e=0.9)
+
+
+def objects(setup: scenario.Scenario) -> list[Ball]:
+    """returns (new) Balls of the scenario, with Vectors, as in main.py"""
+
+    from pygame.math import Vector2
+
+    return [
+        Ball(b.color, b.radius, Vector2(b.position), Vector2(b.velocity),
+        b.density) for b in setup.balls
+    ]
+
+
+def measure(
+        function: Callable[[], Any], repeat: int = REPEAT,
+        budget: float = BUDGET
+    ) -> dict[str, float]:
+    """calls function up to repeat times (stopping early once budget seconds
+    are spent) and returns statistics about the durations of the calls"""
+
+    durations = []
+    start = time.perf_counter()
+    while len(durations) < repeat:
+        before = time.perf_counter()
+        function()
+        durations.append(time.perf_counter() - before)
+        if time.perf_counter() - start > budget:
+            break
+
+    return {
+        "calls": len(durations), "min": min(durations),
+        "median": statistics.median(durations),
+        "mean": statistics.fmean(durations),
+    }
+
+
+def imports(
+        modules: tuple[str] = MODULES, repeat: int = REPEAT
+    ) -> list[dict[str, Any]]:
+    """returns the statistics (as measure) of the durations of importing
+    every module, each time in a fresh interpreter, in the format of the
+    results of benchmark"""
+
+    code = (
+        "import time; start = time.perf_counter(); import {}; "
+        "print(time.perf_counter() - start)"
+    )
+    results = []
+    for module in modules:
+        durations = []
+        for _ in range(repeat):
+            try:
+                run = subprocess.run(
+                    [sys.executable, "-c", code.format(module)], check=True,
+                    capture_output=True, text=True,
+                    cwd=os.path.dirname(os.path.abspath(__file__))
+                )
+            except subprocess.CalledProcessError:
+                break
+            durations.append(float(run.stdout.split()[-1]))
+
+        if durations:
+            results.append({
+                "case": "import", "packing": None, "gravity": None,
+                "balls": 0, "operation": f"import {module}",
+                "calls": len(durations), "min": min(durations),
+                "median": statistics.median(durations),
+                "mean": statistics.fmean(durations),
+            })
+    return results
+
+
+def renderer() -> tuple[Any|None, str|None]:
+    """returns main (with a hidden window) if it can be imported and set up
+    here, and else None along with the reason"""
+
+    try:
+        import main
+        main.init()
+    except Exception as error:
+        return None, f"{type(error).__name__}: {error}"
+    return main, None
+
+
+def operations(
+        setup: scenario.Scenario, main: Any|None
+    ) -> dict[str, Callable[[], Any]]:
+    """returns the operations to be timed on the given scenario: name -> call
+    the Balls move in successive calls, as in successive frames"""
+
+    balls, points = objects(setup), [ball.position for ball in setup.balls]
+    arrays = world.World(setup.balls, capacity=max(len(setup.balls), 1))
+    rng = np.random.default_rng(SEED)
+    picks = [tuple(points[k]) for k in rng.integers(len(points), size=100)]
+    stepped = world.World(setup.balls, capacity=max(len(setup.balls), 1))
+    advanced = world.World(setup.balls, capacity=max(len(setup.balls), 1))
+
+    def step() -> None:
+        stepped.handle(setup.limits, setup.e)
+        stepped.update(setup.dt, setup.gravity, setup.acc, setup.direction)
+
+    calls = {
+        "collisions.handle": lambda: collisions.handle(
+            balls, setup.limits, setup.e
+        ),
+        "generator.Ball.update": lambda: generator.Ball.update(
+            balls, setup.dt, setup.gravity, setup.acc, setup.direction
+        ),
+        "collisions.select": lambda: [
+            collisions.select(point, balls) for point in picks
+        ],
+        "world.World.at": lambda: [arrays.at(point) for point in picks],
+        "world.World.handle": lambda: arrays.handle(setup.limits, setup.e),
+        "world.World.pairs[grid]": lambda: arrays.pairs("grid"),
+        "world.World.pairs[sweep]": lambda: arrays.pairs("sweep"),
+        "world.World.update": lambda: arrays.update(
+            setup.dt, setup.gravity, setup.acc, setup.direction
+        ),
+        "world.World.step": step,
+        "ccd.advance": lambda: ccd.advance(
+            advanced, setup.dt, setup.limits, setup.e, setup.gravity,
+            setup.acc, setup.direction
+        ),
+    }
+
+    if main is not None:
+        main.SIMULATION.balls = arrays
+        main.SIMULATION.publish(interpolate=False)
+
+        def draw() -> None:
+            main.draw_balls(density=1.0, vector=False)
+        calls["main.draw_balls"] = draw
+
+    return calls
+
+
+def revision() -> str|None:
+    """returns the current git commit, if any"""
+
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+            check=True, cwd=os.path.dirname(os.path.abspath(__file__))
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def benchmark(
+        sizes: tuple[int] = SIZES, repeat: int = REPEAT,
+        budget: float = BUDGET, seed: int = SEED, report: bool = True
+    ) -> dict[str, Any]:
+    """times every operation on every case of the given sizes
+    returns the results, along with what they were measured on"""
+
+    results = imports(repeat=repeat)
+    if report:
+        for result in results:
+            print(
+                f"{'import':<24} {result['operation']:<24} "
+                f"{result['median']*1000:10.3f} ms"
+            )
+
+    main, reason = renderer()
+    for count in sizes:
+        for packing in PACKING:
+            for gravity in (True, False):
+                case = Case(packing, gravity, count)
+                setup = build(case, seed)
+                for name, call in operations(setup, main).items():
+                    stats = measure(call, repeat, budget)
+                    results.append({
+                        "case": str(case), "packing": packing,
+                        "gravity": gravity, "balls": count,
+                        "operation": name, **stats,
+                    })
+                    if report:
+                        print(
+                            f"{str(case):<24} {name:<24} "
+                            f"{stats['median']*1000:10.3f} ms"
+                        )
+
+    return {
+        "commit": revision(), "python": platform.python_version(),
+        "numpy": np.__version__, "machine": platform.machine(),
+        "seed": seed, "repeat": repeat, "budget": budget,
+        "skipped": {} if main is not None else {"main.draw_balls": reason},
+        "results": results,
+    }
+
+
+def compare(
+        baseline: dict[str, Any], current: dict[str, Any],
+        tolerance: float = TOLERANCE
+    ) -> list[tuple[str, str, float]]:
+    """returns (case, operation, slowdown) of the operations slower than in
+    the baseline by more than the given factor (on median durations)"""
+
+    before = {
+        (result["case"], result["operation"]): result["median"]
+        for result in baseline["results"]
+    }
+    slower = []
+    for result in current["results"]:
+        key = result["case"], result["operation"]
+        if key in before and result["median"] > before[key] * tolerance:
+            slower.append((*key, result["median"] / before[key]))
+    return slower
+
+
+def main(argv: list[str]|None = None) -> None:
+    """__main__ function"""
+
+    parser = argparse.ArgumentParser(prog="bench", description=__doc__)
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES)
+    parser.add_argument("--repeat", type=int, default=REPEAT)
+    parser.add_argument(
+        "--budget", type=float, default=BUDGET,
+        help="seconds allowed for each operation on each case"
+    )
+    parser.add_argument("--seed", type=int, default=SEED)
+    parser.add_argument("--output", help="write the results into this file")
+    parser.add_argument(
+        "--baseline", help="report regressions against these results"
+    )
+    args = parser.parse_args(argv)
+
+    results = benchmark(args.sizes, args.repeat, args.budget, args.seed)
+    for name, reason in results["skipped"].items():
+        print(f"skipped {name}: {reason}")
+
+    if args.output is not None:
+        with open(args.output, "w") as file:
+            json.dump(results, file, indent=2)
+
+    if args.baseline is not None:
+        with open(args.baseline) as file:
+            slower = compare(json.load(file), results)
+        for case, operation, slowdown in slower:
+            print(f"REGRESSION {case} {operation}: {slowdown:.2f}x slower")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,255 @@
+from generator import Point
+from typing import Callable
+import collisions
+import kernels
+import numpy as np
+import world
+
+
+# Maximum number of instants of impact resolved within a single step
+# the rest of the step is then advanced without looking for impacts
+EVENTS: int = 100
+
+# Candidate pairs are found for Balls going this many times faster than they
+# are, so that they rarely need to be found again after a collision
+SWEEP: float = 2.0
+
+# Balls closer than this fraction of the sum of their radii are in contact
+# (e.g. resting on one-another), and are collided once at the start of a step,
+# as by World.handle, rather than at every instant of impact within it
+CONTACT: float = 1e-3
+
+# Impacts this close (relative to the step) to the earliest one are resolved
+# together with it
+TOLERANCE: float = 1e-9
+
+
+def walls(
+        position: np.ndarray, velocity: np.ndarray, radius: np.ndarray,
+        limits: tuple[Point]
+    ) -> np.ndarray:
+    """returns the time after which every Ball touches each of the walls
+    (Upper, Lower, Left, Right), inf if it is not moving towards it"""
+
+    lower, upper = limits
+    (x, y), (vx, vy) = position.T, velocity.T
+    times = np.full((len(radius), 4), np.inf)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        for wall, (gap, speed) in enumerate((
+                (y - radius - lower, -vy), (upper - radius - y, vy),
+                (x - radius - lower, -vx), (upper - radius - x, vx)
+            )):
+            times[:, wall] = np.where(
+                speed > 0, np.maximum(gap, 0) / speed, np.inf
+            )
+    return times
+
+
+def impacts(
+        position: np.ndarray, velocity: np.ndarray, radius: np.ndarray,
+        first: np.ndarray, second: np.ndarray
+    ) -> np.ndarray:
+    """returns the time after which the Balls of every pair touch, inf if
+    they never touch, or if they already overlap (which advance collides
+    beforehand instead)"""
+
+    dp = position[second] - position[first]
+    dv = velocity[second] - velocity[first]
+    reach = radius[first] + radius[second]
+
+    a, b = (dv**2).sum(axis=1), (dp*dv).sum(axis=1)
+    c = (dp**2).sum(axis=1) - reach**2
+    discriminant = b*b - a*c
+
+    times = np.full(len(first), np.inf)
+    hit = (b < 0) & (c > 0) & (discriminant >= 0)
+    # the numerically stable root of a*t^2 + 2*b*t + c = 0
+    times[hit] = c[hit] / (np.sqrt(discriminant[hit]) - b[hit])
+    return times
+
+
+def touching(
+        position: np.ndarray, radius: np.ndarray, first: np.ndarray,
+        second: np.ndarray
+    ) -> np.ndarray:
+    """returns whether the Balls of every pair are in contact (see CONTACT)"""
+
+    d2 = ((position[second] - position[first])**2).sum(axis=1)
+    return d2 <= ((radius[first] + radius[second]) * (1 + CONTACT))**2
+
+
+def bounce(
+        balls: world.World, hits: np.ndarray,
+        beep: Callable[[int], None]|None = None, frame: int = 0
+    ) -> list[collisions.Collision]:
+    """reverses the velocities of the Balls hitting the walls (as given by
+    hits, see walls)
+    returns the occurred collisions (of Balls by id) in the given frame"""
+
+    records, velocity = [], balls.velocity
+    for row, wall in np.argwhere(hits).tolist():
+        velocity[row, 1 - wall//2] *= -1
+        ball = balls[row]
+        records.append(collisions.Collision(frame, ball.id, -1, wall))
+        if beep is not None:
+            beep(collisions.frequency(ball))
+    return records
+
+
+def collide(
+        balls: world.World, first: np.ndarray, second: np.ndarray, e: float,
+        beep: Callable[[int], None]|None = None, frame: int = 0
+    ) -> list[collisions.Collision]:
+    """collides the Balls of the given pairs in order, skipping the pairs
+    not approaching one-another, e.g. separated by an earlier collision
+    (in the compiled kernels.approach, if enabled)
+    returns the occurred collisions (of Balls by id) in the given frame"""
+
+    if kernels.ENABLED:
+        collided = kernels.approach(
+            first, second, balls.mass, balls.position, balls.velocity, e
+        )
+    else:
+        collided = np.zeros(len(first), dtype=bool)
+        position, velocity = balls.position, balls.velocity
+        for k, (i, j) in enumerate(zip(first.tolist(), second.tolist())):
+            (x1, y1), (x2, y2) = position[i].tolist(), position[j].tolist()
+            (u1, v1), (u2, v2) = velocity[i].tolist(), velocity[j].tolist()
+            if (x2 - x1)*(u2 - u1) + (y2 - y1)*(v2 - v1) >= 0:
+                continue
+            collided[k] = True
+            balls.collide(i, j, e)
+
+    records, first, second = [], first[collided], second[collided]
+    for i, j, id1, id2 in zip(
+            first.tolist(), second.tolist(), balls.ids[first].tolist(),
+            balls.ids[second].tolist()
+        ):
+        records.append(collisions.Collision(frame, id1, id2, -1))
+        if beep is not None:
+            beep(collisions.frequency(balls[i], balls[j]))
+    return records
+
+
+def candidates(
+        balls: world.World, dt: float
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """returns the pairs of Balls that may touch within time dt, along with
+    the reach (radius grown by distance covered) used for every Ball"""
+
+    speed = np.sqrt((balls.velocity**2).sum(axis=1))
+    reach = balls.radius + SWEEP*speed*dt
+    first, second = collisions.neighbours(balls.position, reach)
+    order = np.lexsort((second, first))
+    return first[order], second[order], reach
+
+
+def extend(
+        balls: world.World, reach: np.ndarray, rows: np.ndarray,
+        first: np.ndarray, second: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+    """returns the candidate pairs along with the pairs of the Balls in the
+    given rows, whose reach has grown, without any duplicates"""
+
+    firsts, seconds, position = [first], [second], balls.position
+    for row in rows.tolist():
+        d2 = ((position - position[row])**2).sum(axis=1)
+        near = np.flatnonzero(d2 <= (reach + reach[row])**2)
+        near = near[near != row]
+        firsts.append(np.minimum(near, row))
+        seconds.append(np.maximum(near, row))
+
+    first, second = np.concatenate(firsts), np.concatenate(seconds)
+    keys = np.unique(first*len(reach) + second)
+    return keys // len(reach), keys % len(reach)
+
+
+def advance(
+        balls: world.World, dt: float, limits: tuple[Point], e: float,
+        gravity: bool, g: float, dirn: str,
+        beep: Callable[[int], None]|None = None, frame: int = 0,
+        limit: int = EVENTS
+    ) -> list[collisions.Collision]:
+    """handles collisions and updates positions (and velocities) of the Balls
+    over time dt, resolving every impact at its exact instant, in order
+    so that Balls can neither tunnel through walls nor through one-another
+    same as World.handle followed by World.update, in a single step
+    Balls already in contact (see CONTACT), or touching the walls, are
+    collided once beforehand, as by World.handle, and the pairs of them are
+    left out of the instants of impact of the step
+    at most limit instants of impact are resolved
+    returns the occurred collisions (of Balls by id) in the given frame"""
+
+    if gravity:
+        balls.accelerate(dt, g, dirn)
+
+    remaining = dt
+    first, second, reach = candidates(balls, remaining)
+
+    position, velocity, radius = balls.position, balls.velocity, balls.radius
+    records = bounce(
+        balls, walls(position, velocity, radius, limits) <= 0, beep, frame
+    )
+    contact = touching(position, radius, first, second)
+    records += collide(balls, first[contact], second[contact], e, beep, frame)
+    first, second = first[~contact], second[~contact]
+
+    times = walls(position, velocity, radius, limits)
+    pairs = impacts(position, velocity, radius, first, second)
+    for _ in range(limit):
+        earliest = min(times.min(initial=np.inf), pairs.min(initial=np.inf))
+        if earliest > remaining:
+            break
+
+        earliest = max(earliest, 0.0)
+        position += velocity * earliest
+        remaining -= earliest
+        cutoff = earliest + TOLERANCE*dt
+
+        walled = times <= cutoff
+        records += bounce(balls, walled, beep, frame)
+
+        # an earlier collision of this instant may have separated some
+        hit = np.flatnonzero(pairs <= cutoff)
+        records += collide(balls, first[hit], second[hit], e, beep, frame)
+
+        # only the times of the Balls hit change, the rest merely draw nearer
+        changed = walled.any(axis=1)
+        changed[first[hit]] = changed[second[hit]] = True
+        times -= earliest
+        pairs -= earliest
+        times[changed] = walls(
+            position[changed], velocity[changed], radius[changed], limits
+        )
+        near = np.flatnonzero(changed[first] | changed[second])
+        pairs[near] = impacts(
+            position, velocity, radius, first[near], second[near]
+        )
+
+        # Balls sped up by the collisions may now reach beyond the candidates
+        speed = np.sqrt((velocity**2).sum(axis=1))
+        grown = np.flatnonzero(radius + speed*remaining > reach)
+        if len(grown):
+            reach[grown] = radius[grown] + SWEEP*speed[grown]*remaining
+            first, second = extend(balls, reach, grown, first, second)
+            pairs = impacts(position, velocity, radius, first, second)
+
+    balls.position += balls.velocity * max(remaining, 0.0)
+    if remaining > 0:
+        contain(balls, limits)
+    return records
+
+
+def contain(balls: world.World, limits: tuple[Point]) -> None:
+    """reflects the Balls that crossed a wall (when the impacts in a step ran
+    out) back into the Box, along with their velocities"""
+
+    lower, upper = limits
+    position, velocity, radius = balls.position, balls.velocity, balls.radius
+    low, high = lower + radius, upper - radius
+    for k in range(2):
+        s, v = position[:, k], velocity[:, k]
+        below, above = s < low, s > high
+        s[:] = np.where(below, 2*low - s, np.where(above, 2*high - s, s))
+        v[:] = np.where(below, abs(v), np.where(above, -abs(v), v))
@@ -0,0 +1,118 @@
+from typing import Any
+import generator
+import numpy as np
+import solver
+import world
+import json
+
+
+# A checkpoint is MAGIC, the size of its header, its header (JSON, padded to
+# 8 bytes), every column of the World (see world.FIELDS) and of SLEEP, in
+# order, and then the impulses of the contacts (their keys, then their values)
+MAGIC: bytes = b"BALLSNAP"
+VERSION: int = 2
+
+# Columns of world.CACHED saved along with the Balls, so that the Balls asleep
+# (or about to fall asleep) are restored as they were
+SLEEP: tuple[str] = ("still", "support")
+
+# Cycles of generator, whose positions are saved along with the Balls
+CYCLES: tuple[str] = ("RADII", "DENSITIES")
+
+
+def save(
+        path: str, balls: world.World, state: dict[str, Any]|None = None,
+        contacts: solver.Solver|None = None
+    ) -> None:
+    """saves the Balls (along with how long they have been still), the
+    positions of the cycles of generator, the impulses of contacts (the
+    solver.Solver warm starting the next step), if given, and the given state
+    (e.g. settings of the Simulator, which must be JSON serializable) into a
+    binary checkpoint at path"""
+
+    impulses = {} if contacts is None else contacts.impulses
+    header = json.dumps({
+        "version": VERSION, "count": len(balls), "next_id": balls.next_id,
+        "cycles": {name: getattr(generator, name).index for name in CYCLES},
+        "impulses": len(impulses), "state": state or {},
+    }).encode()
+    header += b" " * (-len(header) % 8)
+
+    with open(path, "wb") as file:
+        file.write(MAGIC)
+        file.write(np.uint64(len(header)).tobytes())
+        file.write(header)
+        for name, (shape, dtype) in world.FIELDS.items():
+            column = balls.precise() if name == "position" else (
+                getattr(balls, name)
+            )
+            file.write(np.ascontiguousarray(column, dtype).data)
+        for name in SLEEP:
+            dtype = world.CACHED[name][1]
+            file.write(np.ascontiguousarray(getattr(balls, name), dtype).data)
+
+        keys = np.array(list(impulses), dtype=np.int64).reshape(-1, 2)
+        file.write(keys.data)
+        file.write(np.array(list(impulses.values()), dtype=np.float64).data)
+
+
+def load(
+        path: str, balls: world.World|None = None,
+        contacts: solver.Solver|None = None
+    ) -> tuple[world.World, dict[str, Any]]:
+    """restores the Balls (into the given World, if any, replacing its Balls),
+    the positions of the cycles of generator and the impulses of contacts, if
+    given, from the checkpoint at path
+    checkpoints of version 1 restore the Balls awake, and no impulses
+    returns the World and the state saved along with it"""
+
+    with open(path, "rb") as file:
+        data = file.read()
+
+    if data[:len(MAGIC)] != MAGIC:
+        raise ValueError(f"{path} is not a checkpoint")
+
+    start = len(MAGIC) + 8
+    size = int(np.frombuffer(data, np.uint64, 1, len(MAGIC))[0])
+    header = json.loads(data[start:start+size])
+    version = header["version"]
+    if version not in (1, VERSION):
+        raise ValueError(f"unsupported checkpoint version {version}")
+
+    count, offset = header["count"], start + size
+    names = {**world.FIELDS, **({
+        name: world.CACHED[name] for name in SLEEP
+    } if version > 1 else {})}
+    columns = {}
+    for name, (shape, dtype) in names.items():
+        items = count * int(np.prod(shape))
+        columns[name] = np.frombuffer(data, dtype, items, offset)
+        columns[name] = columns[name].reshape(count, *shape)
+        offset += columns[name].nbytes
+
+    balls = world.World(capacity=max(count, 1)) if balls is None else balls
+    balls.clear()
+    balls.extend(
+        columns["color"], columns["radius"], columns["position"],
+        columns["velocity"], columns["density"], ids=columns["ids"]
+    )
+    # the masses saved, rather than computed again, so that a resumed run is
+    # the same as the saved one, however its Balls were added
+    balls.mass = columns["mass"]
+    balls.next_id = header["next_id"]
+    for name in SLEEP:
+        if name in columns:
+            setattr(balls, name, columns[name])
+
+    if contacts is not None:
+        impulses = header.get("impulses", 0)
+        keys = np.frombuffer(data, np.int64, 2 * impulses, offset)
+        values = np.frombuffer(data, np.float64, impulses, offset + keys.nbytes)
+        contacts.impulses = dict(zip(
+            map(tuple, keys.reshape(-1, 2).tolist()), values.tolist()
+        ))
+
+    for name, index in header["cycles"].items():
+        getattr(generator, name).index = index
+
+    return balls, header["state"]
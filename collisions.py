@@ -1,11 +1,57 @@
 from generator import Ball, Point
-import winsound
+from typing import Callable, NamedTuple
+import generator
+import kernels
+import numpy as np
+import time
 import math
 
 
 WALLS = {0: "Upper", 1: "Lower", 2: "Left", 3: "Right"}
 
 
+class Collision(NamedTuple):
+    """
+    represents a collision of a Ball with another Ball or with a Wall
+    attributes:
+        self.frame: number of the frame in which the collision occurred
+        self.first: id of the Ball (its index, for a list of Balls)
+        self.second: id of the other Ball, -1 for a collision with a Wall
+        self.wall: the Wall (key of WALLS), -1 for a collision between Balls
+    """
+
+    frame: int
+    first: int
+    second: int
+    wall: int
+
+    def __str__(self) -> str:
+        if self.wall == -1:
+            other = f"Ball {self.second}"
+        else:
+            other = f"{WALLS[self.wall]} Wall"
+        ball = f"Ball {self.first}"
+        return f"Collision in frame {self.frame}: {ball} with {other}"
+
+
+# Side of a cell of the uniform grid used by the broad phase, if the Balls
+# have no size: cells are as wide as the largest Ball, so that two Balls can
+# only collide if they lie in the same or in neighbouring cells
+CELL: float = 2 * generator.maxR
+
+# Neighbouring cells (dx, dy) checked from every cell, so that each pair of
+# cells is visited only once
+NEIGHBOURS: tuple[tuple[int, int]] = ((0, 0), (0, 1), (1, -1), (1, 0), (1, 1))
+
+# Relative tolerance of the vectorized distance test, candidates within it
+# are confirmed using the exact test of collided()
+SLACK: float = 1 + 1e-9
+
+# Number of candidate pairs generated by the broad phases so far (before any
+# test of their distances), in this process, for profiling
+TESTED: int = 0
+
+
 def select(point: Point, balls: list[Ball]) -> Ball|None:
     """returns the Ball on which point lies, if any, else None"""
 
@@ -42,16 +88,303 @@ def collided(ball: Ball, obj: Point|Ball) -> bool:
         return math.dist(obj, ball.position) <= ball.radius
 
 
-def handle(balls: list[Ball], limits: tuple[Point], e: float) -> list[str]:
+def confirm(
+        positions: np.ndarray, radii: np.ndarray, first: np.ndarray,
+        second: np.ndarray
+    ) -> list[tuple[int, int]]:
+    """returns the candidate pairs (first[k], second[k]) that have collided
+    uses the same test as collided(), so that every broad phase agrees
+    only the pairs too close to touching to tell are tested so by the
+    compiled kernels.narrow, if it is enabled"""
+
+    if kernels.ENABLED:
+        outcomes = kernels.narrow(positions, radii, first, second, SLACK)
+        touching = outcomes == kernels.TOUCHING
+        for k in np.flatnonzero(outcomes == kernels.UNDECIDED).tolist():
+            i, j = first[k], second[k]
+            distance = math.dist(positions[i].tolist(), positions[j].tolist())
+            touching[k] = distance <= radii[i] + radii[j]
+        return list(zip(first[touching].tolist(), second[touching].tolist()))
+
+    pairs = []
+    for i, j, p1, p2, r1, r2 in zip(
+            first.tolist(), second.tolist(), positions[first].tolist(),
+            positions[second].tolist(), radii[first].tolist(),
+            radii[second].tolist()
+        ):
+        if math.dist(p1, p2) <= r1 + r2:
+            pairs.append((i, j))
+    return pairs
+
+
+def count(candidates: int) -> None:
+    """adds the number of candidate pairs generated by a broad phase to
+    TESTED"""
+    global TESTED
+
+    TESTED += candidates
+
+
+def brute(positions: np.ndarray, radii: np.ndarray) -> list[tuple[int, int]]:
+    """returns the pairs (i, j), i < j, of colliding Balls in sorted order
+    tests every Ball against every Ball after it, i.e. in O(n^2)"""
+
+    pairs = []
+    count(len(radii) * (len(radii) - 1) // 2)
+    for i in range(len(radii) - 1):
+        d2 = ((positions[i+1:] - positions[i])**2).sum(axis=1)
+        near = np.flatnonzero(d2 <= (radii[i+1:] + radii[i])**2 * SLACK)
+        pairs.extend(confirm(positions, radii, np.full_like(near, i), near+i+1))
+    return pairs
+
+
+def neighbours(
+        positions: np.ndarray, radii: np.ndarray
+    ) -> tuple[np.ndarray, np.ndarray]:
+    """returns the rows (first[k], second[k]), first < second, of the pairs
+    of Balls which (nearly) overlap, in no particular order
+    only tests Balls lying in the same or in neighbouring cells of a grid"""
+
+    n = len(radii)
+    none = np.empty(0, dtype=np.int64)
+    if n < 2:
+        return none, none
+
+    size = 2 * float(radii.max()) or CELL
+    cells = np.floor(positions / size).astype(np.int64)
+    cells -= cells.min(axis=0)
+
+    # one spare column, so that neighbouring keys never wrap into another row
+    width = int(cells[:, 1].max()) + 2
+    keys = cells[:, 0]*width + cells[:, 1]
+    order = np.argsort(keys, kind="stable")
+    ordered = keys[order]
+
+    # work in sorted order, so that the searched keys are sorted as well
+    firsts, seconds = [], []
+    for dx, dy in NEIGHBOURS:
+        target = ordered + dx*width + dy
+        stop = np.searchsorted(ordered, target, side="right")
+        if (dx, dy) == (0, 0):
+            start = np.arange(1, n+1)
+        else:
+            start = np.searchsorted(ordered, target, side="left")
+
+        counts = np.maximum(stop - start, 0)
+        count(total := int(counts.sum()))
+        if not total:
+            continue
+
+        offset = np.arange(total) - np.repeat(np.cumsum(counts)-counts, counts)
+        first = np.repeat(order, counts)
+        second = order[np.repeat(start, counts) + offset]
+
+        # only the pairs near enough are kept, so that the candidates of a
+        # million Balls are never all held at once
+        d2 = ((positions[first] - positions[second])**2).sum(axis=1)
+        near = d2 <= (radii[first] + radii[second])**2 * SLACK
+        first, second = first[near], second[near]
+        firsts.append(np.minimum(first, second))
+        seconds.append(np.maximum(first, second))
+
+    if not firsts:
+        return none, none
+    return np.concatenate(firsts), np.concatenate(seconds)
+
+
+def grid(positions: np.ndarray, radii: np.ndarray) -> list[tuple[int, int]]:
+    """returns the pairs (i, j), i < j, of colliding Balls in sorted order
+    only tests Balls lying in the same or in neighbouring cells of a grid"""
+
+    first, second = neighbours(positions, radii)
+    order = np.lexsort((second, first))
+    return confirm(positions, radii, first[order], second[order])
+
+
+# Factor by which the spread of the Balls along the other axis must exceed
+# the one along the axis swept, for the sweep to change axis, so that it does
+# not switch back and forth (and sort from scratch) every frame
+SWITCH: float = 1.25
+
+# Moves per Ball beyond which the insertion sort of the sweep gives up and
+# sorts from scratch, e.g. after a checkpoint is restored
+MOVES: int = 8
+
+
+class Sweep:
+    """
+    represents a broad phase sorting the intervals covered by the Balls along
+    the axis of greatest spread, and sweeping them to find the overlapping
+    ones (sort-and-sweep), such as a row of Balls resting on a Wall
+    the order of the last call is kept and sorted again by insertion, which
+    is nearly free as Balls only move by velocity * TIME in a step
+    attributes:
+        self.axis: axis swept, 0 (x) or 1 (y)
+        self.order: rows of the Balls sorted by the lower ends of their
+            intervals in the last call, None before the first one
+    """
+
+    def __init__(self) -> None:
+        self.axis = 0
+        self.order: np.ndarray|None = None
+
+    def __call__(
+            self, positions: np.ndarray, radii: np.ndarray
+        ) -> list[tuple[int, int]]:
+        """returns the pairs (i, j), i < j, of colliding Balls in sorted order
+        same signature (and result) as the functions in BROAD_PHASES"""
+
+        n = len(radii)
+        if n < 2:
+            return []
+
+        spread = positions.var(axis=0)
+        if spread[1 - self.axis] > spread[self.axis] * SWITCH:
+            self.axis, self.order = 1 - self.axis, None
+
+        # widened by the tolerance, so that no touching pair is missed to
+        # the rounding of the ends
+        reach = radii * SLACK
+        lows = positions[:, self.axis] - reach
+        order = self.sort(lows)
+        highs = (positions[:, self.axis] + reach)[order]
+
+        # every Ball is paired with those after it, starting before it ends
+        stop = np.searchsorted(lows[order], highs, side="right")
+        counts = stop - np.arange(1, n+1)
+        count(total := int(counts.sum()))
+        if not total:
+            return []
+
+        offset = np.arange(total) - np.repeat(np.cumsum(counts)-counts, counts)
+        first = np.repeat(order, counts)
+        second = order[np.repeat(np.arange(1, n+1), counts) + offset]
+
+        first, second = np.minimum(first, second), np.maximum(first, second)
+        d2 = ((positions[first] - positions[second])**2).sum(axis=1)
+        near = d2 <= (radii[first] + radii[second])**2 * SLACK
+        first, second = first[near], second[near]
+        order = np.lexsort((second, first))
+        return confirm(positions, radii, first[order], second[order])
+
+    def sort(self, lows: np.ndarray) -> np.ndarray:
+        """returns the rows sorted by the given lower ends, starting from the
+        order of the last call (if it had as many Balls), and keeps them"""
+
+        n = len(lows)
+        if self.order is None or len(self.order) != n:
+            self.order = np.argsort(lows, kind="stable")
+        elif kernels.ENABLED:
+            if not kernels.insertion(lows, self.order, MOVES * n):
+                self.order = np.argsort(lows, kind="stable")
+        else:
+            # timsort, which also runs in O(n) on nearly sorted rows
+            self.order = self.order[
+                np.argsort(lows[self.order], kind="stable")
+            ]
+        return self.order
+
+
+def sweep(positions: np.ndarray, radii: np.ndarray) -> list[tuple[int, int]]:
+    """returns the pairs (i, j), i < j, of colliding Balls in sorted order
+    same as a new Sweep, which sorts from scratch, for callers that keep no
+    Sweep of their own (as world.World does) from call to call"""
+
+    return Sweep()(positions, radii)
+
+
+# A broad phase returns the sorted pairs of rows of colliding Balls, given
+# their positions and radii
+BroadPhase = Callable[[np.ndarray, np.ndarray], list[tuple[int, int]]]
+
+# Available broad phases for collisions among Balls
+BROAD_PHASES: dict[str, BroadPhase] = {
+    "brute": brute, "grid": grid, "sweep": sweep
+}
+BROAD_PHASE: str = "grid"
+
+
+def canonical(*columns: np.ndarray) -> np.ndarray:
+    """returns the rows of the Balls in canonical order, i.e. sorted by the
+    given columns (the first one first, e.g. their positions), which does not
+    depend on the order in which the Balls were added (or removed)"""
+
+    if not len(columns[0]):
+        return np.empty(0, dtype=np.int64)
+
+    keys = np.hstack([
+        np.asarray(column, dtype=np.float64).reshape(len(column), -1)
+        for column in columns
+    ])
+    return np.lexsort(keys.T[::-1])
+
+
+def reorder(
+        pairs: list[tuple[int, int]], order: np.ndarray
+    ) -> list[tuple[int, int]]:
+    """returns the pairs of rows sorted by the places of their Balls in the
+    given canonical order (see canonical), by the earlier one first, which
+    also comes first in its pair"""
+
+    rank = np.empty_like(order)
+    rank[order] = np.arange(len(order))
+    first, second = np.array(pairs, dtype=np.int64).reshape(-1, 2).T
+    swap = rank[first] > rank[second]
+    first, second = (
+        np.where(swap, second, first), np.where(swap, first, second)
+    )
+    order = np.lexsort((rank[second], rank[first]))
+    return list(zip(first[order].tolist(), second[order].tolist()))
+
+
+def arrays(balls: list[Ball]) -> tuple[np.ndarray, np.ndarray]:
+    """returns the positions and radii of the Balls as arrays"""
+
+    positions = np.array([tuple(ball.position) for ball in balls], dtype=float)
+    radii = np.array([ball.radius for ball in balls], dtype=float)
+    return positions.reshape(-1, 2), radii
+
+
+def compare(
+        balls: list[Ball], broad: str|BroadPhase = BROAD_PHASE
+    ) -> tuple[bool, float, float]:
+    """returns if the given broad phase ('grid' by default) finds the same
+    collisions as the 'brute' broad phase, along with the time (in seconds)
+    taken by both"""
+
+    positions, radii = arrays(balls)
+    if isinstance(broad, str):
+        broad = BROAD_PHASES[broad]
+
+    start = time.perf_counter()
+    expected = brute(positions, radii)
+    middle = time.perf_counter()
+    found = broad(positions, radii)
+    end = time.perf_counter()
+
+    return found == expected, middle-start, end-middle
+
+
+def handle(
+        balls: list[Ball], limits: tuple[Point], e: float,
+        beep: Callable[[int], None]|None = None,
+        broad: str|BroadPhase = BROAD_PHASE, frame: int = 0,
+        ordered: bool = False
+    ) -> list[Collision]:
     """handles collisions of Balls with walls and with one-another
     updates their velocites according to the collisions
-    returns a list containing information about occurred collisions"""
+    beep, if given, is called with the frequency of every collision
+    broad is the name of a broad phase in BROAD_PHASES, or a function (like
+    parallel.Engine) with the same signature, used to find colliding Balls
+    if ordered is True, the Balls are collided in canonical order (see
+    canonical), so that the result does not depend on the order of the list
+    returns the occurred collisions (of Balls by index) in the given frame"""
 
     collisions = []
     lower, upper = limits
 
     # Handle Collisions with Walls
-    for ball in balls:
+    for k, ball in enumerate(balls):
         x, y = ball.position
         points = [(x, lower), (x, upper), (lower, y), (upper, y)]
 
@@ -59,23 +392,46 @@ def handle(balls: list[Ball], limits: tuple[Point], e: float) -> list[str]:
             if not collided(ball, point):
                 continue
 
-            collisions.append(f"Collision: {ball} with {WALLS[i]} Wall")
-            winsound.Beep(frequency(ball), 10)
+            collisions.append(Collision(frame, k, -1, i))
+            if beep is not None:
+                beep(frequency(ball))
 
             ball.velocity.y *= -1 if (i < 2) else +1
             ball.velocity.x *= +1 if (i < 2) else -1
 
     # Handle Collisions with other Balls
-    for i, b1 in enumerate(balls, start=1):
-        for b2 in balls[i:]:
-            if not collided(b1, b2):
-                continue
+    # positions do not change here, so all the pairs can be found beforehand
+    if isinstance(broad, str):
+        broad = BROAD_PHASES[broad]
+    positions, radii = arrays(balls)
+    pairs = broad(positions, radii)
+    if ordered and pairs:
+        velocities = [tuple(ball.velocity) for ball in balls]
+        densities = [ball.density for ball in balls]
+        colors = [ball.color for ball in balls]
+        order = canonical(positions, velocities, radii, densities, colors)
+        pairs = reorder(pairs, order)
+
+    for i, j in pairs:
+        b1, b2 = balls[i], balls[j]
 
-            collisions.append(f"Collision: {b1} with {b2}")
-            winsound.Beep(frequency(b1, b2), 10)
+        collisions.append(Collision(frame, i, j, -1))
+        if beep is not None:
+            beep(frequency(b1, b2))
 
-            m1, m2, u1, u2 = b1.mass, b2.mass, b1.velocity, b2.velocity
-            b1.velocity = ((m1 - e*m2)*u1 + (1 + e)*m2*u2) / (m1 + m2)
-            b2.velocity = ((1 + e)*m1*u1 + (m2 - e*m1)*u2) / (m1 + m2)
+        # same as ((m1 - e*m2)*u1 + (1 + e)*m2*u2) / (m1 + m2) (and so on)
+        # on Vectors, which divide by multiplying with the reciprocal, but
+        # without creating any temporary Vectors
+        m1, m2 = b1.mass, b2.mass
+        (u1x, u1y), (u2x, u2y) = b1.velocity, b2.velocity
+        inverse = 1 / (m1 + m2)
+        b1.velocity.update(
+            ((m1 - e*m2)*u1x + (1 + e)*m2*u2x) * inverse,
+            ((m1 - e*m2)*u1y + (1 + e)*m2*u2y) * inverse
+        )
+        b2.velocity.update(
+            ((1 + e)*m1*u1x + (m2 - e*m1)*u2x) * inverse,
+            ((1 + e)*m1*u1y + (m2 - e*m1)*u2y) * inverse
+        )
 
     return collisions
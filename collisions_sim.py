@@ -0,0 +1,263 @@
+"""Headless Collision Simulator
+
+Runs the physics of the Collision Simulator without opening a window, loading
+fonts, launching menus or playing sounds, e.g. on compute nodes:
+
+    python -m collisions_sim run scenario.json --steps 1000
+
+The scenario is a JSON file describing the Balls and the settings of the
+simulation (see scenario.parse), and steps per second are reported at the end
+"""
+
+from generator import Ball
+from typing import Any, TextIO
+import collisions
+import checkpoint
+import kernels
+import recorder
+import parallel
+import world
+import ccd
+import generator
+import scenario
+import solver
+import contextlib
+import argparse
+import json
+import time
+import os
+
+# pygame is only used for its Vectors here, so keep quiet about it
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+
+# Engines driving the physics: the arrays of world.World, or a list of Balls
+ENGINES: tuple[str] = ("world", "objects")
+
+
+def step(
+        balls: world.World|list[Ball], setup: scenario.Scenario,
+        broad: str|collisions.BroadPhase = collisions.BROAD_PHASE,
+        frame: int = 0, contacts: solver.Solver|None = None
+    ) -> list[collisions.Collision]:
+    """runs a single step of the scenario, in the same order as the main loop
+    of the Simulator (collisions first, then motion)
+    contacts is the solver.Solver kept from step to step, if setup.solver
+    returns the collisions that occurred in it"""
+
+    if isinstance(balls, list):
+        records = collisions.handle(
+            balls, setup.limits, setup.e, broad=broad, frame=frame,
+            ordered=setup.ordered
+        )
+        generator.Ball.update(
+            balls, setup.dt, setup.gravity, setup.acc, setup.direction
+        )
+    elif setup.ccd:
+        records = ccd.advance(
+            balls, setup.dt, setup.limits, setup.e, setup.gravity, setup.acc,
+            setup.direction, frame=frame
+        )
+    else:
+        records = balls.handle(
+            setup.limits, setup.e, broad=broad, frame=frame, sleep=setup.sleep,
+            solver=contacts if setup.solver else None, ordered=setup.ordered
+        )
+        balls.update(
+            setup.dt, setup.gravity, setup.acc, setup.direction, setup.sleep
+        )
+
+    return records
+
+
+def digest(balls: world.World|list[Ball]) -> str:
+    """returns the hash of the state of the Balls (see world.World.digest)"""
+
+    if isinstance(balls, list):
+        balls = world.World(balls, capacity=max(len(balls), 1))
+    return balls.digest()
+
+
+def simulate(
+        setup: scenario.Scenario, steps: int, engine: str = "world",
+        broad: str|collisions.BroadPhase = collisions.BROAD_PHASE,
+        recording: recorder.Recorder|None = None, save: str|None = None,
+        hashes: TextIO|None = None, server: "stream.Server|None" = None
+    ) -> dict[str, Any]:
+    """runs the given number of steps of the scenario
+    impacts are resolved at their exact instants if setup.ccd is True, every
+    step is recorded if recording is not None, and a checkpoint is saved at
+    path save in the end if it is not None, which are only supported by the
+    'world' engine
+    the hash of the state of the Balls (see world.World.digest) after every
+    step is written into hashes, if given, as a line 'step hash', and the
+    Balls are streamed to the dashboards of server (see stream.Server) along
+    with the collisions so far, if given
+    returns statistics about the run, along with the hash of the last state"""
+
+    contacts = solver.Solver()
+    if engine == "world":
+        balls = setup.build(contacts)
+    elif setup.ccd or setup.sleep or setup.solver or setup.compact:
+        raise ValueError(
+            "ccd, sleep, solver and compact need the 'world' engine"
+        )
+    elif recording is not None or save is not None or server is not None:
+        raise ValueError(
+            "recording, saving and streaming need the 'world' engine"
+        )
+    else:
+        from pygame.math import Vector2
+
+        # built as a World first, so that spawned Balls and checkpoints are
+        # supported the same by both engines
+        state = setup.build()
+        balls = [
+            Ball(tuple(color), radius, Vector2(position), Vector2(velocity),
+            density) for color, radius, position, velocity, density in zip(
+                state.color.tolist(), state.radius.tolist(),
+                state.position.tolist(), state.velocity.tolist(),
+                state.density.tolist()
+            )
+        ]
+
+    if engine == "world":
+        kernels.warm(balls)
+    elif broad == "sweep":
+        # kept from step to step, as every World keeps its own
+        broad = collisions.Sweep()
+
+    count = 0
+    start = time.perf_counter()
+    for frame in range(steps):
+        records = step(balls, setup, broad, frame, contacts)
+        count += len(records)
+        if recording is not None:
+            recording.write(balls, records)
+        if hashes is not None:
+            hashes.write(f"{frame} {digest(balls)}\n")
+        if server is not None:
+            server.send(balls, frame + 1, {
+                "collisions": len(records), "total": count,
+                "seconds": time.perf_counter() - start,
+            })
+    elapsed = time.perf_counter() - start
+
+    if save is not None:
+        checkpoint.save(
+            save, balls, {**setup.settings(), "frame": steps}, contacts
+        )
+
+    return {
+        "balls": len(balls), "steps": steps, "collisions": count,
+        "seconds": elapsed, "steps_per_second": steps / elapsed,
+        "digest": digest(balls),
+    }
+
+
+def run(args: argparse.Namespace) -> None:
+    """runs the scenario given on the command line and reports about it"""
+
+    setup = scenario.load(args.scenario)
+    setup.ccd = setup.ccd or args.ccd
+    setup.sleep = setup.sleep or args.sleep
+    setup.solver = setup.solver or args.solver
+    setup.ordered = setup.ordered or args.ordered
+    setup.compact = setup.compact or args.compact or args.accumulate
+    setup.accumulate = setup.accumulate or args.accumulate
+    setup.checkpoint = args.checkpoint or setup.checkpoint
+
+    with contextlib.ExitStack() as stack:
+        broad, recording = args.broad, None
+        if args.workers is not None:
+            broad = stack.enter_context(parallel.Engine(args.workers))
+        if args.record is not None:
+            recording = stack.enter_context(recorder.Recorder(args.record))
+        hashes = None
+        if args.hashes is not None:
+            hashes = stack.enter_context(open(args.hashes, "w"))
+        server = None
+        if args.stream is not None:
+            # imported on use, as asyncio takes a while to import
+            import stream
+
+            server = stack.enter_context(
+                stream.Server(setup.limits, port=args.stream)
+            )
+        stats = simulate(
+            setup, args.steps, args.engine, broad, recording, args.save,
+            hashes, server
+        )
+    if args.json:
+        print(json.dumps(stats))
+    else:
+        print(
+            f"{stats['steps']} steps of {stats['balls']} Balls in "
+            f"{stats['seconds']:.3f} s: {stats['steps_per_second']:.1f} "
+            f"steps/s, {stats['collisions']} collisions, state "
+            f"{stats['digest']}"
+        )
+
+
+def main(argv: list[str]|None = None) -> None:
+    """__main__ function"""
+
+    parser = argparse.ArgumentParser(prog="collisions_sim", description=__doc__)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("run", help="run a scenario headless")
+    command.add_argument("scenario", help="path to the JSON scenario")
+    command.add_argument("--steps", type=int, default=1000)
+    command.add_argument("--engine", choices=ENGINES, default="world")
+    command.add_argument(
+        "--broad", choices=tuple(collisions.BROAD_PHASES),
+        default=collisions.BROAD_PHASE
+    )
+    command.add_argument(
+        "--workers", type=int, help="find collisions on this many processes"
+    )
+    command.add_argument("--record", help="record every step into this path")
+    command.add_argument(
+        "--save", help="save a checkpoint into this path in the end"
+    )
+    command.add_argument(
+        "--checkpoint", help="start from this checkpoint, not the Balls"
+    )
+    command.add_argument(
+        "--ccd", action="store_true", help="resolve impacts at their instants"
+    )
+    command.add_argument(
+        "--sleep", action="store_true", help="put Balls at rest to sleep"
+    )
+    command.add_argument(
+        "--solver", action="store_true",
+        help="solve contacts as constraints, pushing overlapping Balls apart"
+    )
+    command.add_argument(
+        "--ordered", action="store_true",
+        help="collide Balls in canonical order, whatever order they are in"
+    )
+    command.add_argument(
+        "--hashes", help="write the hash of the state after every step here"
+    )
+    command.add_argument(
+        "--compact", action="store_true",
+        help="store the Balls in single precision, in half the memory"
+    )
+    command.add_argument(
+        "--accumulate", action="store_true",
+        help="store them compactly, keeping what positions lose in rounding"
+    )
+    command.add_argument(
+        "--stream", type=int, metavar="PORT",
+        help="stream the Balls to dashboards on this port of localhost"
+    )
+    command.add_argument("--json", action="store_true", help="print as JSON")
+    command.set_defaults(func=run)
+
+    args = parser.parse_args(argv)
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
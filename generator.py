@@ -1,7 +1,8 @@
-from dataclasses import dataclass, field
+from typing import Iterable
 import numpy as np
 import itertools
 import random
+import math
 
 
 # Type Aliases
@@ -9,11 +10,32 @@ Color = tuple[int, int, int]
 Point = tuple[float, float]
 
 
-def iterable(lower: float, upper: float, dx: float) -> itertools.cycle:
+class Cycle:
+    """
+    represents an infinite iterable cycling through the given values
+    unlike itertools.cycle, its position can be reset, saved and restored
+    attributes:
+        self.values: the values cycled through
+        self.index: index of the value to be returned next
+    """
+
+    def __init__(self, values: Iterable[float]) -> None:
+        self.values, self.index = list(values), 0
+
+    def __iter__(self) -> "Cycle":
+        return self
+
+    def __next__(self) -> float:
+        value = self.values[self.index]
+        self.index = (self.index + 1) % len(self.values)
+        return value
+
+
+def iterable(lower: float, upper: float, dx: float) -> Cycle:
     """returns an inifite iterable lower -> upper -> lower -> ...
     dx is the difference between successive terms"""
 
-    return itertools.cycle(itertools.chain(
+    return Cycle(itertools.chain(
         np.arange(lower, upper+dx, dx), np.arange(upper, lower-dx, -dx)
     ))
 
@@ -31,23 +53,43 @@ maxD: float = 15.0
 DENSITIES = iterable(minD, maxD, dD)
 
 
+# Generator of the random colors, seeded (see seed) for reproducible runs
+RANDOM: random.Random = random.Random()
+
+
+def seed(value: int|None) -> None:
+    """seeds the generator of the random colors, None seeds it from the
+    system, as at start"""
+
+    RANDOM.seed(value)
+
+
 def color() -> Color:
     """returns a random color"""
 
-    return tuple(random.randrange(256) for _ in range(3))
+    return tuple(RANDOM.randrange(256) for _ in range(3))
 
 
-def reset(iterable: itertools.cycle, lower: float) -> None:
+def mass(radius: float|np.ndarray, density: float|np.ndarray) -> float:
+    """returns the mass of Balls of given radii and densities, as floats or
+    as arrays, by the same operations either way (radius * radius, unlike
+    radius**2, rounds the same in Python and in NumPy), so that Balls and
+    Worlds, however the Balls are added, give the same masses"""
+
+    return math.pi * (radius * radius) * density
+
+
+def reset(iterable: Cycle, lower: float) -> None:
     """resets the iterable to start from 0.0 (RADII) / 1.0 (DENSITIES) again"""
 
-    while next(iterable) != lower:
-        next(iterable)
+    iterable.index = iterable.values.index(lower)
 
 
-@dataclass
 class Ball:
     """
     represents a Ball object that moves in 2D-space
+    its mass is computed once, and again only if its radius or density
+    change
     attributes:
         self.color: color of the Ball
         self.radius: radius of the Ball (as float)
@@ -57,15 +99,59 @@ class Ball:
         self.mass: mass of the Ball
     """
 
-    color: Color
-    radius: float
-    position: "pygame.math.Vector2"
-    velocity: "pygame.math.Vector2"
-    density: float
-    mass: float = field(init=False, repr=False)
+    __slots__ = (
+        "color", "position", "velocity", "_radius", "_density", "_mass"
+    )
 
-    def __post_init__(self):
-        self.mass = float(np.pi * self.radius**2 * self.density)
+    def __init__(
+            self, color: Color, radius: float,
+            position: "pygame.math.Vector2", velocity: "pygame.math.Vector2",
+            density: float
+        ) -> None:
+        self.color, self.position, self.velocity = color, position, velocity
+        self._radius, self._density = radius, density
+        self._mass = None
+
+    def __repr__(self) -> str:
+        return (
+            f"Ball(color={self.color!r}, radius={self.radius!r}, "
+            f"position={self.position!r}, velocity={self.velocity!r}, "
+            f"density={self.density!r})"
+        )
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, Ball):
+            return NotImplemented
+        return (
+            self.color, self.radius, self.position, self.velocity, self.density
+        ) == (
+            other.color, other.radius, other.position, other.velocity,
+            other.density
+        )
+
+    __hash__ = None
+
+    @property
+    def radius(self) -> float:
+        return self._radius
+
+    @radius.setter
+    def radius(self, value: float) -> None:
+        self._radius, self._mass = value, None
+
+    @property
+    def density(self) -> float:
+        return self._density
+
+    @density.setter
+    def density(self, value: float) -> None:
+        self._density, self._mass = value, None
+
+    @property
+    def mass(self) -> float:
+        if self._mass is None:
+            self._mass = mass(self._radius, self._density)
+        return self._mass
 
     @staticmethod
     def update(
@@ -74,10 +160,10 @@ class Ball:
         """updates the position (and veloctiy) of the Balls according to their
         velocities and gravitational acceleration, if any"""
 
-        sign, axis = dirn
-        at, at2 = g*dt, 1/2*g*dt**2
+        (sign, axis), at, at2 = dirn, g*dt, 1/2*g*dt**2
+        k = "xy".index(axis)
         for ball in balls:
             if gravity:
-                exec(f"ball.position.{axis} {sign}= at2")
-                exec(f"ball.velocity.{axis} {sign}= at")
-            ball.position += ball.velocity * dt
\ No newline at end of file
+                ball.position[k] += at2 if sign == "+" else -at2
+                ball.velocity[k] += at if sign == "+" else -at
+            ball.position += ball.velocity * dt
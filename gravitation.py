@@ -1,7 +1,3 @@
-import tkinter as tk
-import tkinter.messagebox as msg
-
-
 g: dict[str, float] = {
     "SUN": 273.71,
     "MERCURY": 3.703,
@@ -111,7 +107,11 @@ def main(fps: int, curr_acc: float, curr_planet: str) -> tuple[str, float]:
     """displays options to change the value of Gravitational Acceleration
     fps is the number to scale g by
     current is the current value of g"""
-    global root, G, PLANET
+    global root, G, PLANET, tk, msg
+
+    # tkinter is only needed for the menu, the values of g are used headless
+    import tkinter as tk
+    import tkinter.messagebox as msg
 
     root = tk.Tk()
     root.title("Change Gravitational Acceleration")
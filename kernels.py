@@ -0,0 +1,179 @@
+"""Compiled kernels of the narrow phase, of the collisions among Balls and of
+the sorts of the sweep broad phase
+
+The kernels are compiled by numba, if it is installed, and otherwise the
+reference Python code (collisions.confirm, world.World.collide,
+ccd.collide and the stable sort of collisions.Sweep) is used
+both do the same floating point operations in the same order, so that they
+give bit-identical results
+
+numba itself is only imported by the first call of a kernel, as importing it
+takes longer than importing the rest of the physics
+"""
+
+import importlib.util
+import numpy as np
+import functools
+
+
+# Whether the kernels can be (and are) used
+AVAILABLE: bool = importlib.util.find_spec("numba") is not None
+ENABLED: bool = AVAILABLE
+
+# Outcomes of the narrow phase for every pair
+APART, TOUCHING, UNDECIDED = 0, 1, -1
+
+
+def kernel(function):
+    """returns the function compiled by numba (keeping strict floating point
+    semantics) on its first call, or the function itself if numba is not
+    installed"""
+
+    if not AVAILABLE:
+        return function
+
+    @functools.cache
+    def compiled():
+        import numba
+        return numba.njit(cache=True, nogil=True)(function)
+
+    @functools.wraps(function)
+    def call(*args):
+        return compiled()(*args)
+    return call
+
+
+@kernel
+def narrow(
+        positions: np.ndarray, radii: np.ndarray, first: np.ndarray,
+        second: np.ndarray, slack: float
+    ) -> np.ndarray:
+    """returns whether the Balls of every pair (first[k], second[k]) touch
+    pairs within the relative tolerance slack of touching are UNDECIDED, to be
+    tested exactly (with math.dist) as collisions.confirm does"""
+
+    outcomes = np.empty(len(first), dtype=np.int8)
+    for k in range(len(first)):
+        i, j = first[k], second[k]
+        # in double precision, as math.dist, even for compact Worlds
+        dx = float(positions[j, 0]) - float(positions[i, 0])
+        dy = float(positions[j, 1]) - float(positions[i, 1])
+        reach = float(radii[i]) + float(radii[j])
+        d2, r2 = dx*dx + dy*dy, reach*reach
+
+        if d2 * slack <= r2:
+            outcomes[k] = TOUCHING
+        elif d2 > r2 * slack:
+            outcomes[k] = APART
+        else:
+            outcomes[k] = UNDECIDED
+    return outcomes
+
+
+@kernel
+def resolve(
+        first: np.ndarray, second: np.ndarray, mass: np.ndarray,
+        velocity: np.ndarray, still: np.ndarray, e: float, sleep: bool,
+        frames: int
+    ) -> np.ndarray:
+    """collides the Balls of every pair (first[k], second[k]) in order, same
+    as world.World.collide, updating their velocities in place
+    if sleep is True, pairs of Balls asleep (still for frames steps) are
+    skipped, and Balls asleep are woken or stopped as in world.World.handle
+    returns whether every pair was collided"""
+
+    collided = np.ones(len(first), dtype=np.bool_)
+    for k in range(len(first)):
+        i, j = first[k], second[k]
+        if sleep and min(still[i], still[j]) >= frames:
+            collided[k] = False
+            continue
+
+        m1, m2 = float(mass[i]), float(mass[j])
+        u1x, u1y = float(velocity[i, 0]), float(velocity[i, 1])
+        u2x, u2y = float(velocity[j, 0]), float(velocity[j, 1])
+        inverse = 1 / (m1 + m2)
+        velocity[i, 0] = ((m1 - e*m2)*u1x + (1 + e)*m2*u2x) * inverse
+        velocity[i, 1] = ((m1 - e*m2)*u1y + (1 + e)*m2*u2y) * inverse
+        velocity[j, 0] = ((1 + e)*m1*u1x + (m2 - e*m1)*u2x) * inverse
+        velocity[j, 1] = ((1 + e)*m1*u1y + (m2 - e*m1)*u2y) * inverse
+
+        if sleep:
+            for row, other in ((i, j), (j, i)):
+                if still[row] >= frames and not still[other]:
+                    still[row] = 0
+                elif still[row] >= frames:
+                    velocity[row, 0] = velocity[row, 1] = 0.0
+    return collided
+
+
+@kernel
+def approach(
+        first: np.ndarray, second: np.ndarray, mass: np.ndarray,
+        position: np.ndarray, velocity: np.ndarray, e: float
+    ) -> np.ndarray:
+    """collides the Balls of every pair (first[k], second[k]) in order, same
+    as world.World.collide, skipping the pairs not approaching one-another
+    (once their turn comes), same as ccd.collide
+    returns whether every pair was collided"""
+
+    collided = np.zeros(len(first), dtype=np.bool_)
+    for k in range(len(first)):
+        i, j = first[k], second[k]
+        u1x, u1y = float(velocity[i, 0]), float(velocity[i, 1])
+        u2x, u2y = float(velocity[j, 0]), float(velocity[j, 1])
+        dx = float(position[j, 0]) - float(position[i, 0])
+        dy = float(position[j, 1]) - float(position[i, 1])
+        if dx*(u2x - u1x) + dy*(u2y - u1y) >= 0:
+            continue
+
+        collided[k] = True
+        m1, m2 = float(mass[i]), float(mass[j])
+        inverse = 1 / (m1 + m2)
+        velocity[i, 0] = ((m1 - e*m2)*u1x + (1 + e)*m2*u2x) * inverse
+        velocity[i, 1] = ((m1 - e*m2)*u1y + (1 + e)*m2*u2y) * inverse
+        velocity[j, 0] = ((1 + e)*m1*u1x + (m2 - e*m1)*u2x) * inverse
+        velocity[j, 1] = ((1 + e)*m1*u1y + (m2 - e*m1)*u2y) * inverse
+    return collided
+
+
+@kernel
+def insertion(keys: np.ndarray, order: np.ndarray, limit: int) -> bool:
+    """sorts the rows in order by their keys in place, by insertion, which
+    takes O(n) moves for rows nearly sorted already (as in the last frame)
+    gives up once more than limit moves are made, leaving order unsorted
+    (though still holding every row), returns whether order is sorted"""
+
+    moves = 0
+    for k in range(1, len(order)):
+        row, key = order[k], keys[order[k]]
+        m = k - 1
+        while m >= 0 and keys[order[m]] > key:
+            order[m+1] = order[m]
+            m -= 1
+        order[m+1] = row
+        moves += k - 1 - m
+        if moves > limit:
+            return False
+    return True
+
+
+def warm(balls: "world.World") -> None:
+    """compiles (or loads from the cache of numba) the kernels for the
+    columns of the given World, on empty rows, e.g. before timing a run, so
+    that compiling is not counted in it"""
+
+    if not ENABLED:
+        return
+
+    none = np.empty(0, dtype=np.int64)
+    position, radius = balls.position[:0], balls.radius[:0]
+    narrow(position, radius, none, none, 1.0)
+    resolve(
+        none, none, balls.mass[:0], balls.velocity[:0], balls.still[:0], 1.0,
+        False, 0
+    )
+    approach(
+        none, none, balls.mass[:0], position, balls.velocity[:0], 1.0
+    )
+    insertion(position[:, 0] - radius * 1.0, none.copy(), 0)
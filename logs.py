@@ -0,0 +1,39 @@
+import logging.handlers
+import logging
+import queue
+
+
+# Number of records buffered before they are written into the file
+# records of level WARNING (or above) are written immediately, with the rest
+CAPACITY: int = 1024
+
+
+class QueueHandler(logging.handlers.QueueHandler):
+    """puts records on a queue as they are, so that their formatting (and
+    writing) is left to the thread of a logging.handlers.QueueListener
+    the arguments of the records must not change after logging them, like
+    collisions.Collision"""
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+
+def configure(
+        filename: str, level: int, format: str, capacity: int = CAPACITY
+    ) -> logging.handlers.QueueListener:
+    """configures the root logger to write into the given file in batches of
+    capacity records, from a background thread
+    returns the (started) listener, which must be stopped on exiting"""
+
+    file = logging.FileHandler(filename)
+    file.setFormatter(logging.Formatter(format))
+    buffer = logging.handlers.MemoryHandler(capacity, logging.WARNING, file)
+
+    records: queue.SimpleQueue[logging.LogRecord] = queue.SimpleQueue()
+    listener = logging.handlers.QueueListener(records, buffer)
+    listener.start()
+
+    logger = logging.getLogger()
+    logger.setLevel(level)
+    logger.addHandler(QueueHandler(records))
+    return listener
@@ -5,23 +5,49 @@ according to the velocities given to them, collide and move accordingly.
 The Walls on the edges are Walls of infinite mass.
 Press CTRL to see the CONTROLS
 Press 'L' to log the current state of all the Balls
+
+The physics runs on its own thread at RATE steps per second (see physics.py),
+so that neither drawing nor the dialogs slow the Balls down
+
+Run with --record PATH to record every frame (see recorder.py), and with
+--replay PATH to play a recording back without simulating it
+Press 'S' to save a checkpoint of the Simulator and 'O' to restore it, or run
+with --restore PATH to start from a checkpoint (see checkpoint.py)
+Run with --lockstep (and --seed N) to step the physics along with the frames
+instead, so that runs are reproducible
+Run with --stream PORT to stream the Balls to dashboards (see stream.py)
 """
 
+import functools
 import pygame
+import argparse
+import recorder
+import checkpoint
+import os
+import logging.handlers
 import logging
-import winsound
+import logs
 import generator
 import collisions
 import gravitation
 import restitution
-
-pygame.font.init()
+import render
+import physics
+import profiler
+import world
+import sound
 
 
 # Constants
 SIDE: int = 625
 FPS:  int = 100
-TIME: float = 1 / FPS
+
+# Steps of the physics per second, run on their own thread (see physics.py)
+# however fast the Balls are drawn (FPS)
+# a step per frame by default: higher rates (e.g. 1000) resolve fast Balls
+# better, at as many times the work, which large scenes cannot keep up with
+RATE: int = FPS
+TIME: float = 1 / RATE
 
 BORDER: int = 20
 LOWER:  int = BORDER + generator.maxR
@@ -30,8 +56,29 @@ UPPER:  int = SIDE - LOWER
 # Lower and Upper Limits of the screens (i.e. positions of the Walls)
 LIMITS: generator.Point = (BORDER-7, SIDE-BORDER+10)
 
-# List of Balls
-BALLS: list[generator.Ball] = []
+# Path of the checkpoint saved / restored by pressing 'S' / 'O'
+CHECKPOINT: str = "collisions.snap"
+
+# Resolve impacts at their exact instants within a frame (see ccd.advance)
+# so that fast Balls cannot escape the Box or get stuck together
+CCD: bool = False
+
+# Put the Balls at rest (e.g. settled into piles) to sleep, skipping them
+# until they are hit or gravity changes (see world.World.update)
+SLEEP: bool = False
+
+# Solve the contacts of the Balls as constraints, pushing the Balls that
+# overlap apart (see solver.py), so that dense piles stay stable
+SOLVER: bool = False
+
+# Path into which the percentiles of the timers and counters of the frames
+# (and of the steps of the physics) are exported: every EXPORT frames while
+# they are shown (press 'F'), and on quitting
+PROFILE: str = "collisions.profile.json"
+EXPORT: int = FPS
+
+# Balls of the Simulation, stored as contiguous arrays
+BALLS: world.World = world.World()
 
 # Colors
 BLACK: generator.Color = (  0,   0,   0)
@@ -39,28 +86,110 @@ WHITE: generator.Color = (255, 255, 255)
 GRAY:  generator.Color = (127, 127, 127)
 RED:   generator.Color = (200,   0,   0)
 
-# Fonts
-FONT1 = pygame.font.SysFont("SEGOEUISYMBOL", 45, "BOLD")
-FONT2 = pygame.font.SysFont("GEORGIA", 35)
-FONT3 = pygame.font.SysFont("GEORGIA", 27)
-FONT4 = pygame.font.SysFont("CONSOLAS", 25)
-FONT5 = pygame.font.SysFont("CONSOLAS", 20)
-FONT6 = pygame.font.SysFont("CONSOLAS", 15)
+# Fonts (name, size and style), loaded on first use (see font)
+FONTS: dict[int, tuple[str, ...]] = {
+    1: ("SEGOEUISYMBOL", 45, "BOLD"),
+    2: ("GEORGIA", 35),
+    3: ("GEORGIA", 27),
+    4: ("CONSOLAS", 25),
+    5: ("CONSOLAS", 20),
+    6: ("CONSOLAS", 15),
+}
 
-# Controls of the Simulation
-with open("controls.txt") as file:
-    CONTROLS: list[str] = file.read().splitlines()
+# Controls of the Simulation, read on first use (see read_controls)
+CONTROLS: str = os.path.join(os.path.dirname(__file__), "controls.txt")
 
 # Information about the Logger
+# records are formatted and written in batches by a background thread
 LOG_FORMAT: str = "%(levelname)s: %(asctime)s - %(message)s"
-logging.basicConfig(
-    filename="collisions.log", level=logging.INFO, format=LOG_FORMAT
-)
 logger = logging.getLogger()
 
-# Initialize the Window / Screen
-WINDOW: pygame.Surface = pygame.display.set_mode((SIDE, SIDE))
-pygame.display.set_caption("Collision Simulator")
+# The rest is set up by init(), so that importing main has no side effects
+LOG_LISTENER: logging.handlers.QueueListener|None = None
+
+# Player of the Beeps on collisions, running on its own thread
+SOUND: sound.Dispatcher|None = None
+
+# Physics of the Balls, stepped on its own thread
+# the Balls must only be edited within SIMULATION.edit()
+SIMULATION: physics.Simulation|None = None
+
+# The Window / Screen, and the drawing of the frames, redrawing only what
+# changed since the last one
+WINDOW: pygame.Surface|None = None
+RENDER: render.Renderer|None = None
+
+# Timers of the phases of every frame, and the lines of their overlay, which
+# are rendered again every REFRESH frames
+PROFILER = profiler.Profiler()
+OVERLAY: list[pygame.Surface] = []
+REFRESH: int = 10
+
+
+def init() -> None:
+    """starts the Logger, the sounds and the physics, and opens the Window, on
+    the first call (later calls do nothing)"""
+    global LOG_LISTENER, SOUND, SIMULATION, WINDOW, RENDER
+
+    if WINDOW is not None:
+        return
+
+    LOG_LISTENER = logs.configure(
+        filename="collisions.log", level=logging.INFO, format=LOG_FORMAT
+    )
+    SOUND = sound.Dispatcher(sound.default())
+    SIMULATION = physics.Simulation(
+        BALLS, physics.Settings(
+            LIMITS, restitution.E, True, gravitation.g["EARTH"]*FPS, "+y",
+            ccd=CCD, sleep=SLEEP, solver=SOLVER
+        ), TIME, beep=SOUND.play
+    )
+
+    WINDOW = pygame.display.set_mode((SIDE, SIDE))
+    pygame.display.set_caption("Collision Simulator")
+    RENDER = render.Renderer(WINDOW)
+
+
+@functools.cache
+def font(number: int) -> pygame.font.Font:
+    """returns the font of given number (see FONTS), loading it on first use,
+    as finding the fonts of the system is slow"""
+
+    if not pygame.font.get_init():
+        pygame.font.init()
+    return pygame.font.SysFont(*FONTS[number])
+
+
+@functools.cache
+def read_controls() -> list[str]:
+    """returns the lines of the controls of the Simulation (see CONTROLS)"""
+
+    with open(CONTROLS) as file:
+        return file.read().splitlines()
+
+
+def paint(surface: pygame.Surface, controls: bool) -> None:
+    """draws the background of the screen: the Walls, and the controls if
+    controls is True"""
+
+    surface.fill(WHITE)
+    pygame.draw.rect(surface, BLACK, (0, 0, SIDE, SIDE), width=BORDER)
+
+    if controls:
+        heading = font(1).render("CONTROLS", 1, BLACK)
+        underline = font(1).render("_"*12, 1, BLACK)
+        surface.blit(heading, ((SIDE-heading.get_width())//2, 10))
+        surface.blit(underline, ((SIDE-underline.get_width()) /2, 15))
+
+        # lines are closer together once there are too many of them
+        lines = read_controls()
+        gap = min(26, 480 // len(lines))
+        for i, line in enumerate(lines):
+            face = font(4) if ":" in line else font(6)
+            surface.blit(face.render(line, 1, BLACK), (30, 80+i*gap))
+
+        footing = font(2).render("Press 'CTRL' to continue...", 1, BLACK)
+        surface.blit(footing, ((SIDE-footing.get_width()) // 2, 570))
 
 
 def draw_screen(
@@ -73,42 +202,30 @@ def draw_screen(
         if simulator is paused, display text - 'PAUSED'
         if ball is not None, display information about the selected ball"""
 
-        WINDOW.fill(WHITE)
-        pygame.draw.rect(WINDOW, BLACK, (0, 0, SIDE, SIDE), width=BORDER)
-
+        RENDER.begin(controls, lambda surface: paint(surface, controls))
         if controls:
-            heading = FONT1.render("CONTROLS", 1, BLACK)
-            underline = FONT1.render("_"*12, 1, BLACK)
-            WINDOW.blit(heading, ((SIDE-heading.get_width())//2, 10))
-            WINDOW.blit(underline, ((SIDE-underline.get_width()) /2, 15))
-
-            for i, line in enumerate(CONTROLS):
-                font = FONT4 if ":" in line else FONT6
-                WINDOW.blit(font.render(line, 1, BLACK), (30, 80+i*26))
-
-            footing = FONT2.render("Press 'CTRL' to continue...", 1, BLACK)
-            WINDOW.blit(footing, ((SIDE-footing.get_width()) // 2, 570))
             return
 
         draw_info(ball)
 
         if box:
             rect = (LOWER, LOWER, UPPER-LOWER, UPPER-LOWER)
-            pygame.draw.rect(WINDOW, GRAY, rect, width=2)
+            RENDER.mark(pygame.draw.rect(WINDOW, GRAY, rect, width=2))
 
         arrow = {"+y": "↓", "-y": "↑", "+x": "→", "-x": "←"}[direction]
         switch = "ON" if gravity else "OFF"
-        bg = FONT1.render(f"GRAVITY {arrow}: {switch}", 1, GRAY)
+        bg = render.text(font(1), f"GRAVITY {arrow}: {switch}", GRAY)
         if planet is not None:
-            text = FONT2.render(planet, 1, GRAY)
+            text = render.text(font(2), planet, GRAY)
         else:
-            text = FONT3.render(f"Current Value of g = {acc/FPS:.2f}", 1, GRAY)
+            value = f"Current Value of g = {acc/FPS:.2f}"
+            text = render.text(font(3), value, GRAY)
 
-        WINDOW.blit(bg, ((SIDE-bg.get_width())//2, (SIDE-bg.get_height())//2))
-        WINDOW.blit(text, ((SIDE-text.get_width())//2, 255))
+        RENDER.blit(bg, ((SIDE-bg.get_width())//2, (SIDE-bg.get_height())//2))
+        RENDER.blit(text, ((SIDE-text.get_width())//2, 255))
 
         if paused:
-            WINDOW.blit(FONT2.render("PAUSED", 1, GRAY), (470, 575))
+            RENDER.blit(render.text(font(2), "PAUSED", GRAY), (470, 575))
 
 
 def draw_info(ball: generator.Ball|None = None) -> None:
@@ -120,23 +237,24 @@ def draw_info(ball: generator.Ball|None = None) -> None:
     center: generator.Point = (210, 35)
     (sx, sy), (vx, vy) = ball.position, ball.velocity
     den, pos, vel = (450, 50), (25, 60), (25, 90)
+    face = font(5)
 
-    WINDOW.blit(FONT3.render("Selected Ball:", 1, BLACK), (25, 20))
-    pygame.draw.circle(WINDOW, ball.color, center, 15)
+    RENDER.blit(render.text(font(3), "Selected Ball:", BLACK), (25, 20))
+    RENDER.mark(pygame.draw.circle(WINDOW, ball.color, center, 15))
     pygame.draw.circle(WINDOW, BLACK, center, 15, width=3)
 
-    WINDOW.blit(FONT5.render(f"Radius: {ball.radius:.2f}", 1, GRAY), (270, 25))
-    WINDOW.blit(FONT5.render(f"Mass: {ball.mass:.2f}", 1, GRAY), (450, 25))
-    WINDOW.blit(FONT5.render(f"Density: {ball.density:.2f}", 1, GRAY), den)
-    WINDOW.blit(FONT5.render(f"Position: ({sx:.2f}, {sy:.2f})", 1, GRAY), pos)
-    WINDOW.blit(FONT5.render(f"Velocity: ({vx:.2f}, {vy:.2f})", 1, GRAY), vel)
+    RENDER.blit(face.render(f"Radius: {ball.radius:.2f}", 1, GRAY), (270, 25))
+    RENDER.blit(face.render(f"Mass: {ball.mass:.2f}", 1, GRAY), (450, 25))
+    RENDER.blit(face.render(f"Density: {ball.density:.2f}", 1, GRAY), den)
+    RENDER.blit(face.render(f"Position: ({sx:.2f}, {sy:.2f})", 1, GRAY), pos)
+    RENDER.blit(face.render(f"Velocity: ({vx:.2f}, {vy:.2f})", 1, GRAY), vel)
 
 
 def vary_density(density: float) -> None:
     """draws an iterating bar on the screen to represent density"""
 
     scale = (generator.maxD - density) * 10
-    pygame.draw.rect(WINDOW, RED, (25, 400+scale, 40, 175-scale))
+    RENDER.mark(pygame.draw.rect(WINDOW, RED, (25, 400+scale, 40, 175-scale)))
     pygame.draw.rect(WINDOW, BLACK, (25, 400+scale, 40, 175-scale), width=5)
 
 
@@ -145,32 +263,104 @@ def spawn_ball(
     ) -> None:
     """initializes a Ball at the given position with given iterating radius"""
 
-    pygame.draw.circle(WINDOW, BLACK, center, radius+3, width=3)
+    RENDER.mark(pygame.draw.circle(WINDOW, BLACK, center, radius+3, width=3))
     pygame.draw.circle(WINDOW, color, center, radius)
-    pygame.draw.line(WINDOW, color, center, pygame.mouse.get_pos(), 2)
+    RENDER.mark(
+        pygame.draw.line(WINDOW, color, center, pygame.mouse.get_pos(), 2)
+    )
+
 
+def draw_region(corner: generator.Point) -> None:
+    """draws the rectangle from corner to the mouse, whose Balls are removed
+    on releasing the Right-Mouse Button"""
 
-def draw_balls(density: float, vector: bool) -> None:
+    (x0, y0), (x1, y1) = corner, pygame.mouse.get_pos()
+    rect = (min(x0, x1), min(y0, y1), abs(x1-x0), abs(y1-y0))
+    RENDER.mark(pygame.draw.rect(WINDOW, RED, rect, width=2))
+
+
+def draw_balls(density: float, vector: bool) -> int:
     """draw all current Balls on the screen, along with current density
-    if vector is True, draw the velocity vector of the Ball"""
+    if vector is True, draw the velocity vector of the Ball
+    returns the number of Balls drawn"""
 
-    WINDOW.blit(FONT5.render(f"Density: {density:.2f}", 1, GRAY), (25, 587))
+    RENDER.blit(render.text(font(5), f"Density: {density:.2f}", GRAY), (25, 587))
+    return RENDER.balls(SIMULATION.view(), vector)
 
-    for ball in BALLS:
-        if vector:
-            end = ball.position + (vel := ball.velocity)
-            normal = 2 * vel.normalize() if vel else vel
-            pygame.draw.line(WINDOW, ball.color, ball.position, end, width=2)
-            for i in range(5):
-                pygame.draw.circle(WINDOW, ball.color, end-i*normal, i)
 
-        pygame.draw.circle(WINDOW, BLACK, ball.position, ball.radius+3, width=3)
-        pygame.draw.circle(WINDOW, ball.color, ball.position, ball.radius)
+def draw_profile() -> None:
+    """draws the percentiles (p50 and p99) of the timers (in ms) and counters
+    of the frames and of the steps of the physics, above the text 'PAUSED'"""
+
+    if not OVERLAY or PROFILER.frames % REFRESH == 0:
+        lines = [f"{'':<11}{'p50':>8}{'p99':>8}"]
+        timers = (("frame", PROFILER), ("step", SIMULATION.profiler))
+        for kind, timer in timers:
+            for name, points in timer.summary().items():
+                lines.append(
+                    f"{kind} {name:<6}{points['p50']:8.2f}{points['p99']:8.2f}"
+                )
+        OVERLAY[:] = [font(6).render(line, 1, GRAY) for line in lines]
 
+    top = 570 - 16*len(OVERLAY)
+    for i, line in enumerate(OVERLAY):
+        RENDER.blit(line, (SIDE - BORDER - 10 - line.get_width(), top + 16*i))
 
-def main() -> None:
-    """__main__ function"""
 
+def replay(path: str) -> None:
+    """plays the recording at path back, drawing its frames in order
+    P pauses, LEFT and RIGHT step backward and forward through the frames
+    every frame is a step of the physics, so RATE / FPS are skipped at once"""
+
+    init()
+    clock = pygame.time.Clock()
+    frames = recorder.Replay(path)
+    frame, paused, running = 0, False, len(frames) > 0
+    skip = max(1, RATE // FPS)
+
+    while running:
+        clock.tick(FPS)
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                running = False
+
+            elif event.type == pygame.WINDOWEXPOSED:
+                RENDER.invalidate()
+
+            elif event.type == pygame.KEYDOWN:
+                if event.key == pygame.K_p:
+                    paused = not paused
+                elif event.key == pygame.K_LEFT:
+                    frame = max(frame-1, 0)
+                elif event.key == pygame.K_RIGHT:
+                    frame = min(frame+1, len(frames)-1)
+
+        with SIMULATION.edit():
+            frames.load(frame, BALLS)
+        draw_screen(
+            False, False, False, "+y", paused, f"REPLAY: {frame}", 0, None
+        )
+        draw_balls(density=0.0, vector=False)
+        RENDER.present()
+
+        if not paused:
+            frame = min(frame+skip, len(frames)-1)
+
+
+def main(
+        record: str|None = None, restore: str|None = None,
+        lockstep: bool = False, serve: int|None = None
+    ) -> None:
+    """__main__ function
+    if record is not None, every step is recorded into that path
+    if restore is not None, the Simulator starts from the checkpoint at path
+    if lockstep is True, RATE / FPS steps are run for every frame, colliding
+    the Balls in canonical order, instead of in real time, so that the same
+    events (by frame) give bit-identical runs
+    if serve is not None, the Balls drawn and the timers of the last frame
+    (and step) are streamed to the dashboards on that port (see stream.py)"""
+
+    init()
     clock = pygame.time.Clock()
     arrow_keys: dict[pygame.event.key, str] = {
         pygame.K_DOWN: "+y", pygame.K_UP: "-y",
@@ -189,7 +379,39 @@ def main() -> None:
 
     density: float = 1.0
     hold_radius = hold_density = vector = paused = controls = box = False
-    gravity, selection = True, None
+    profile = False
+    gravity, selection, corner = True, None, None
+
+    # Broad phase finding the colliding Balls (see collisions.BROAD_PHASES)
+    broad = collisions.BROAD_PHASE
+
+    recording = None if record is None else recorder.Recorder(record)
+    server = None
+    if serve is not None:
+        # imported on use, as asyncio takes a while to import
+        import stream
+
+        server = stream.Server(LIMITS, port=serve)
+        server.start()
+
+    def step(records: list[collisions.Collision]) -> None:
+        """handles the collisions of a step, on the thread of the physics"""
+
+        # Collisions are logged one by one only at DEBUG level (thousands of
+        # them may occur in a step), and else counted once per step
+        if logger.isEnabledFor(logging.DEBUG):
+            for collision in records:
+                logger.debug("%s", collision)
+        elif records and logger.isEnabledFor(logging.INFO):
+            frame, count = records[0].frame, len(records)
+            logger.info("Collisions in frame %d: %d", frame, count)
+        if recording is not None:
+            recording.write(BALLS, records)
+        SOUND.flush()
+
+    SIMULATION.record = step
+    if not lockstep:
+        SIMULATION.start()
 
     logger.info(f"INITIALIZED Collision Simulator: {(FPS, e) = }")
     logger.warning(f"Gravity of {planet}: {direction = }")
@@ -197,15 +419,35 @@ def main() -> None:
     running = True
     while running:
         clock.tick(FPS)
+        PROFILER.lap("wait")
+
+        if restore is not None:
+            with SIMULATION.edit():
+                state = checkpoint.load(restore, BALLS, SIMULATION.solver)[1]
+                SIMULATION.frame = state["frame"]
+            direction, planet, acc = (
+                state["direction"], state["planet"], state["acc"]
+            )
+            e, gravity, paused = state["e"], state["gravity"], state["paused"]
+            density = state["density"]
+            hold_radius = hold_density = controls = False
+            selection = corner = None
+            logger.warning(f"Restored Checkpoint: {restore}")
+            restore = None
+
         draw_screen(
             controls, box, gravity, direction, paused, planet, acc, selection
         )
+        PROFILER.lap("draw")
 
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 logger.info("QUITING Collision Simulator")
                 running = False
 
+            elif event.type == pygame.WINDOWEXPOSED:
+                RENDER.invalidate()
+
             elif event.type == pygame.KEYDOWN:
                 if event.key in arrow_keys:
                     direction = arrow_keys[event.key]
@@ -215,16 +457,22 @@ def main() -> None:
                 elif event.key in (pygame.K_LCTRL, pygame.K_RCTRL):
                     controls = paused = not controls
                     hold_radius = hold_density = box = False
-                    selection = None
+                    selection = corner = None
                     log = f"{'Opened' if controls else 'Closed'} Controls"
                     logger.info(log)
 
+                elif event.key == pygame.K_a:
+                    phases = list(collisions.BROAD_PHASES)
+                    broad = phases[(phases.index(broad) + 1) % len(phases)]
+                    logger.warning(f"Broad Phase: changed to {broad}")
+
                 elif event.key == pygame.K_b:
                     if not (controls or hold_density) and selection is None:
                         box = not box
 
                 elif event.key == pygame.K_c:
                     planet, acc = gravitation.main(FPS, acc, planet)
+                    RENDER.invalidate()
                     if planet is None:
                         log = f"Gravitational Acceleration (g) changed to {acc}"
                     else:
@@ -237,6 +485,7 @@ def main() -> None:
 
                 elif event.key == pygame.K_e:
                     e = restitution.main(e)
+                    RENDER.invalidate()
                     logger.warning(f"Coefficient of Restitution changed to {e}")
 
                 elif event.key == pygame.K_g:
@@ -245,10 +494,12 @@ def main() -> None:
                     logger.warning(log)
 
                 elif event.key == pygame.K_l:
-                    if not BALLS:
+                    with SIMULATION.lock:
+                        state = repr(BALLS) if BALLS else None
+                    if state is None:
                         logger.warning("The Screen is empty")
                     else:
-                        logger.info(f"Current State of the BALLS: {BALLS}")
+                        logger.info(f"Current State of the BALLS: {state}")
 
                 elif event.key == pygame.K_p:
                     if not controls:
@@ -257,22 +508,46 @@ def main() -> None:
                         log = f"Simulator {'PAUSED' if paused else 'RESUMED'}"
                         logger.warning(log)
 
+                elif event.key == pygame.K_s:
+                    state = {
+                        "direction": direction, "planet": planet, "acc": acc,
+                        "e": e, "gravity": gravity, "paused": paused,
+                        "density": density, "frame": SIMULATION.frame
+                    }
+                    with SIMULATION.lock:
+                        checkpoint.save(
+                            CHECKPOINT, BALLS, state, SIMULATION.solver
+                        )
+                    logger.warning(f"Saved Checkpoint: {CHECKPOINT}")
+
+                elif event.key == pygame.K_o:
+                    if os.path.exists(CHECKPOINT):
+                        restore = CHECKPOINT
+                    else:
+                        log = f"No Checkpoint to restore: {CHECKPOINT}"
+                        logger.warning(log)
+
                 elif event.key == pygame.K_r:
                     if BALLS:
-                        BALLS.clear()
+                        with SIMULATION.edit():
+                            BALLS.clear()
                         selection = None
                         logger.warning("Removed: ALL Balls")
 
                 elif event.key == pygame.K_v:
                     vector = not vector
 
+                elif event.key == pygame.K_f:
+                    profile = not profile
+
             elif event.type == pygame.MOUSEBUTTONDOWN:
                 if event.button == 1:
                     center = (x, y) = event.pos
-                    selection = collisions.select(center, BALLS)
+                    with SIMULATION.lock:
+                        selection = BALLS.at(center)
                     if selection is not None:
                         box = False
-                        winsound.PlaySound("SystemExit", winsound.SND_ASYNC)
+                        sound.alert()
                         logger.info(f"Selected Ball at {center}: {selection}")
                         continue
 
@@ -284,16 +559,42 @@ def main() -> None:
 
                 elif event.button == 3:
                     point = event.pos
-                    if (ball := collisions.select(point, BALLS)) is not None:
-                        selection = None if selection is ball else selection
-                        BALLS.remove(ball)
-                        logger.warning(f"Removed: {ball}")
-                        winsound.PlaySound("SystemExit", winsound.SND_ASYNC)
+                    with SIMULATION.edit():
+                        ball = BALLS.at(point)
+                        if ball is not None:
+                            log = f"Removed: {ball}"
+                            BALLS.discard((ball,))
+
+                    if ball is not None:
+                        selection = None if selection == ball else selection
+                        logger.warning(log)
+                        sound.alert()
 
                     elif hold_radius:
                         hold_radius = False
                         logger.warning(f"Cancelled Ball at: {point}")
-                        winsound.PlaySound("SystemExit", winsound.SND_ASYNC)
+                        sound.alert()
+
+                    elif not controls:
+                        corner = point
+
+            elif event.type == pygame.MOUSEBUTTONUP and event.button == 3:
+                if corner is None:
+                    continue
+
+                (x0, y0), (x1, y1) = corner, event.pos
+                low = (min(x0, x1), min(y0, y1))
+                high = (max(x0, x1), max(y0, y1))
+                corner = None
+                with SIMULATION.edit():
+                    removed = BALLS.within(low, high)
+                    BALLS.discard(removed)
+
+                if removed:
+                    selection = None if selection in removed else selection
+                    log = f"Removed: {len(removed)} Balls in {(low, high) = }"
+                    logger.warning(log)
+                    sound.alert()
 
             elif event.type == pygame.MOUSEBUTTONUP and event.button == 1:
                 if not hold_radius:
@@ -302,33 +603,90 @@ def main() -> None:
                 hold_radius = False
                 center = pygame.math.Vector2(center)
                 vel = center - pygame.math.Vector2(pygame.mouse.get_pos())
-                BALLS.append(
-                    ball := generator.Ball(color, radius, center, vel, density)
-                )
-                logger.info(f"Created: {ball}")
+                with SIMULATION.edit():
+                    ball = BALLS.append(
+                        generator.Ball(color, radius, center, vel, density)
+                    )
+                logger.info(f"Created Ball {ball.id}: {ball}")
 
             elif event.type == pygame.KEYUP and event.key == pygame.K_d:
                 if not hold_density:
                     continue
                 hold_density = False
 
+        PROFILER.lap("events")
+
         if hold_radius:
             spawn_ball(center, (radius := next(generator.RADII)), color)
 
+        if corner is not None:
+            draw_region(corner)
+
         if hold_density:
             vary_density(density := next(generator.DENSITIES))
 
-        if not paused:
-            for collision in collisions.handle(BALLS, LIMITS, e=e):
-                logger.info(collision)
-
-            generator.Ball.update(BALLS, TIME, gravity, acc, direction)
+        # the physics (see SIMULATION) takes these up from its next step
+        SIMULATION.settings = physics.Settings(
+            LIMITS, e, gravity, acc, direction, paused, CCD, SLEEP, SOLVER,
+            broad, lockstep
+        )
+        if lockstep:
+            SIMULATION.advance(RATE // FPS)
+            PROFILER.lap("physics")
 
         if not controls:
-            draw_balls(density=density, vector=vector)
-
-        pygame.display.update()
+            PROFILER.count("drawn", draw_balls(density=density, vector=vector))
+            if profile:
+                draw_profile()
+        PROFILER.lap("draw")
+
+        RENDER.present()
+        PROFILER.lap("display")
+        PROFILER.tick()
+
+        if server is not None:
+            snapshot = SIMULATION.snapshots[1]
+            server.send(snapshot, snapshot.frame, {
+                "fps": clock.get_fps(), "frame": PROFILER.latest(),
+                "step": SIMULATION.profiler.latest(),
+            })
+
+        if profile and PROFILER.frames % EXPORT == 0:
+            profiler.export(
+                PROFILE, frames=PROFILER, steps=SIMULATION.profiler
+            )
+
+    SIMULATION.stop()
+    profiler.export(PROFILE, frames=PROFILER, steps=SIMULATION.profiler)
+    SOUND.close()
+    LOG_LISTENER.stop()
+    if recording is not None:
+        recording.close()
+    if server is not None:
+        server.close()
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Collision Simulator")
+    parser.add_argument("--record", help="record every frame into this path")
+    parser.add_argument("--replay", help="play the recording at this path")
+    parser.add_argument("--restore", help="start from the checkpoint at path")
+    parser.add_argument(
+        "--lockstep", action="store_true",
+        help="run a fixed number of steps for every frame, reproducibly"
+    )
+    parser.add_argument("--seed", type=int, help="seed the colors of Balls")
+    parser.add_argument(
+        "--stream", type=int, metavar="PORT",
+        help="stream the Balls to dashboards on this port of localhost"
+    )
+    args = parser.parse_args()
+    generator.seed(args.seed)
+
+    if args.replay is not None:
+        replay(args.replay)
+    else:
+        main(
+            record=args.record, restore=args.restore, lockstep=args.lockstep,
+            serve=args.stream
+        )
\ No newline at end of file
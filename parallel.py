@@ -0,0 +1,119 @@
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+import collisions
+import numpy as np
+import os
+
+
+# Below this many Balls, pairs are found in-process (the pool costs more)
+MINIMUM: int = 10_000
+
+
+def detect(
+        name: str, count: int, low: float, high: float, halo: float
+    ) -> tuple[np.ndarray, np.ndarray, int]:
+    """returns the colliding pairs (first[k], second[k]) owned by the strip
+    low <= x < high, reading the Balls from the shared memory of given name,
+    and the number of candidate pairs generated for the strip
+    a pair is owned by the strip of its Ball with the lower (x, row), so that
+    every pair is found by exactly one strip"""
+
+    memory = shared_memory.SharedMemory(name=name)
+    try:
+        data = np.ndarray((count, 3), dtype=np.float64, buffer=memory.buf)
+        x = data[:, 0].copy()
+        rows = np.flatnonzero((x >= low) & (x <= high + halo))
+        positions, radii = data[rows, :2], data[rows, 2]
+        del data
+    finally:
+        memory.close()
+
+    tested = collisions.TESTED
+    first, second = collisions.neighbours(positions, radii)
+    tested = collisions.TESTED - tested
+    pairs = collisions.confirm(positions, radii, first, second)
+    first, second = rows[np.array(pairs, dtype=np.int64).reshape(-1, 2).T]
+
+    # first < second, so ties in x are owned by the first Ball
+    owner = np.where(x[second] < x[first], second, first)
+    keep = (x[owner] >= low) & (x[owner] < high)
+    return first[keep], second[keep], tested
+
+
+class Engine:
+    """
+    represents a broad phase finding colliding pairs of Balls on a pool of
+    processes, each working on a vertical strip of the Box
+    the Balls are shared with the processes through shared memory, and the
+    pairs are merged in sorted order, the same as collisions.grid
+    attributes:
+        self.workers: number of processes (and strips)
+        self.minimum: number of Balls below which pairs are found in-process
+        self.pool: the pool of processes
+        self.memory: shared memory holding x, y and radius of every Ball
+    """
+
+    def __init__(
+            self, workers: int|None = None, minimum: int = MINIMUM
+        ) -> None:
+        self.workers = workers or os.cpu_count()
+        self.minimum = minimum
+        self.pool = ProcessPoolExecutor(self.workers)
+        self.memory: shared_memory.SharedMemory|None = None
+
+    def __enter__(self) -> "Engine":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def __call__(
+            self, positions: np.ndarray, radii: np.ndarray
+        ) -> list[tuple[int, int]]:
+        """returns the pairs (i, j), i < j, of colliding Balls in sorted order
+        same signature (and result) as the functions in BROAD_PHASES"""
+
+        count = len(radii)
+        if count < self.minimum or self.workers < 2:
+            return collisions.grid(positions, radii)
+
+        size = count * 3 * np.dtype(np.float64).itemsize
+        if self.memory is None or self.memory.size < size:
+            self.release()
+            self.memory = shared_memory.SharedMemory(create=True, size=2*size)
+
+        data = np.ndarray((count, 3), dtype=np.float64, buffer=self.memory.buf)
+        data[:, :2], data[:, 2] = positions, radii
+        del data
+
+        # strips holding the same number of Balls, for balanced work
+        bounds = np.quantile(positions[:, 0], np.linspace(0, 1, self.workers+1))
+        bounds[0], bounds[-1] = -np.inf, np.inf
+        halo = 2 * float(radii.max()) * collisions.SLACK
+
+        futures = [
+            self.pool.submit(
+                detect, self.memory.name, count, low, high, halo
+            ) for low, high in zip(bounds[:-1].tolist(), bounds[1:].tolist())
+        ]
+        results = [future.result() for future in futures]
+
+        first = np.concatenate([first for first, _, _ in results])
+        second = np.concatenate([second for _, second, _ in results])
+        collisions.count(sum(tested for _, _, tested in results))
+        order = np.lexsort((second, first))
+        return list(zip(first[order].tolist(), second[order].tolist()))
+
+    def release(self) -> None:
+        """frees the shared memory, if any"""
+
+        if self.memory is not None:
+            self.memory.close()
+            self.memory.unlink()
+            self.memory = None
+
+    def close(self) -> None:
+        """shuts the pool of processes down and frees the shared memory"""
+
+        self.pool.shutdown()
+        self.release()
@@ -0,0 +1,259 @@
+from dataclasses import dataclass
+from typing import Callable, Iterator
+import collisions
+import contextlib
+import threading
+import numpy as np
+import profiler
+import solver
+import world
+import time
+import ccd
+
+
+# Time (s) the physics may fall behind at once, beyond which it is dropped
+# (i.e. the Simulation slows down instead of running ever longer batches)
+LAG: float = 0.1
+
+
+@dataclass(frozen=True)
+class Settings:
+    """
+    represents the settings of the physics, which are replaced (never changed)
+    by the loop of events, so that every step sees a consistent set of them
+    attributes:
+        self.limits: lower and upper limits (i.e. positions of the Walls)
+        self.e: coefficient of restitution
+        self.gravity: whether gravity is ON
+        self.acc: acceleration due to gravity
+        self.direction: direction of gravity, one of +y, -y, +x, -x
+        self.paused: whether the Simulation is paused
+        self.ccd: whether impacts are resolved at their exact instants
+        self.sleep: whether Balls at rest are put to sleep (see World.update),
+            which is not done along with ccd
+        self.solver: whether contacts are solved as constraints (see
+            solver.Solver), which is not done along with ccd either
+        self.broad: name of the broad phase (see collisions.BROAD_PHASES),
+            which is not used by ccd
+        self.ordered: whether the Balls are collided in canonical order (see
+            world.World.canonical), for reproducible runs
+    """
+
+    limits: tuple[float, float]
+    e: float
+    gravity: bool
+    acc: float
+    direction: str
+    paused: bool = False
+    ccd: bool = False
+    sleep: bool = False
+    solver: bool = False
+    broad: str = collisions.BROAD_PHASE
+    ordered: bool = False
+
+    def wakes(self, previous: "Settings") -> bool:
+        """returns whether the Balls asleep must be woken on changing from the
+        previous settings, i.e. if gravity changed"""
+
+        return (self.gravity, self.acc, self.direction, self.sleep) != (
+            previous.gravity, previous.acc, previous.direction, previous.sleep
+        )
+
+
+class Snapshot:
+    """
+    represents a copy of the Balls of a World at an instant, which is never
+    changed once taken, so that it can be drawn while the World is stepped
+    attributes:
+        self.ids, self.color, self.radius, self.position, self.velocity: the
+            columns of the Balls (see world.FIELDS)
+        self.frame: number of steps run before the snapshot
+        self.time: time (time.perf_counter) at which it was taken
+    """
+
+    def __init__(self, balls: world.World, frame: int, now: float) -> None:
+        self.ids, self.color = balls.ids.copy(), balls.color.copy()
+        self.radius = balls.radius.copy()
+        self.position = balls.position.copy()
+        self.velocity = balls.velocity.copy()
+        self.frame, self.time = frame, now
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def interpolate(self, previous: "Snapshot", alpha: float) -> "Snapshot":
+        """returns the snapshot a fraction alpha of the way from previous to
+        this one, or this one if the Balls changed in between"""
+
+        if alpha >= 1 or not np.array_equal(previous.ids, self.ids):
+            return self
+
+        between = object.__new__(Snapshot)
+        between.__dict__.update(self.__dict__)
+        between.position = previous.position + alpha * (
+            self.position - previous.position
+        )
+        return between
+
+
+class Simulation:
+    """
+    represents the physics of a World run on its own thread in fixed steps of
+    time dt, however fast (or slow) it is drawn, or run in lockstep with the
+    frames (see advance)
+    the elapsed time is accumulated and consumed one step at a time, and every
+    batch of steps publishes a Snapshot: the last two are interpolated for
+    drawing
+    attributes:
+        self.balls: the World being simulated
+        self.settings: the Settings of the physics
+        self.applied: the Settings of the last step
+        self.dt: time advanced in every step
+        self.record: called with the collisions of every step, if not None
+        self.beep: called with the frequency of every collision, if not None
+        self.frame: number of steps run so far
+        self.profiler: the profiler.Profiler of the steps, timing collisions
+            and motion, and counting the pairs tested and the collisions
+        self.solver: the solver.Solver of the contacts (used if enabled in the
+            settings), which keeps their impulses from step to step
+        self.lock: held while the Balls are stepped or edited
+        self.snapshots: the last two Snapshots, (previous, current)
+        self.thread: the thread running the steps, once started
+        self.stopped: set to stop the thread
+    """
+
+    def __init__(
+            self, balls: world.World, settings: Settings, dt: float,
+            record: Callable[[list[collisions.Collision]], None]|None = None,
+            beep: Callable[[int], None]|None = None
+        ) -> None:
+        self.balls, self.settings, self.dt = balls, settings, dt
+        self.applied = settings
+        self.record, self.beep = record, beep
+        self.frame = 0
+        self.solver = solver.Solver()
+        self.profiler = profiler.Profiler()
+        self.lock = threading.RLock()
+        snapshot = Snapshot(balls, 0, time.perf_counter())
+        self.snapshots = (snapshot, snapshot)
+        self.thread: threading.Thread|None = None
+        self.stopped = threading.Event()
+
+    def start(self) -> None:
+        """starts stepping the Balls on a background thread"""
+
+        self.stopped.clear()
+        self.thread = threading.Thread(target=self.run, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        """stops the thread, once its current step is done"""
+
+        self.stopped.set()
+        if self.thread is not None:
+            self.thread.join()
+            self.thread = None
+
+    def step(self) -> list[collisions.Collision]:
+        """runs a single step of the physics (collisions first, then motion)
+        returns the collisions that occurred in it"""
+
+        s, balls, timer = self.settings, self.balls, self.profiler
+        if s.wakes(self.applied):
+            balls.wake()
+        self.applied = s
+
+        tested = collisions.TESTED
+        if s.ccd:
+            with timer.phase("ccd"):
+                records = ccd.advance(
+                    balls, self.dt, s.limits, s.e, s.gravity, s.acc,
+                    s.direction, beep=self.beep, frame=self.frame
+                )
+        else:
+            with timer.phase("handle"):
+                records = balls.handle(
+                    s.limits, e=s.e, beep=self.beep, broad=s.broad,
+                    frame=self.frame, sleep=s.sleep,
+                    solver=self.solver if s.solver else None,
+                    ordered=s.ordered
+                )
+            with timer.phase("update"):
+                balls.update(self.dt, s.gravity, s.acc, s.direction, s.sleep)
+
+        timer.count("tested", collisions.TESTED - tested)
+        timer.count("collisions", len(records))
+        timer.tick()
+        self.frame += 1
+        return records
+
+    def run(self) -> None:
+        """steps the Balls in real time until stopped"""
+
+        accumulator, last = 0.0, time.perf_counter()
+        limit = max(1, round(LAG / self.dt))
+
+        while not self.stopped.is_set():
+            now = time.perf_counter()
+            accumulator, last = accumulator + now - last, now
+            if self.settings.paused:
+                accumulator = 0.0
+
+            steps = 0
+            while accumulator >= self.dt and steps < limit:
+                with self.lock:
+                    records = self.step()
+                    if self.record is not None:
+                        self.record(records)
+                accumulator, steps = accumulator - self.dt, steps + 1
+            if steps:
+                with self.lock:
+                    self.publish()
+
+            # the time fallen behind is dropped
+            accumulator = min(accumulator, self.dt)
+            self.stopped.wait(self.dt - accumulator)
+
+    def advance(self, steps: int) -> None:
+        """runs the given number of steps at once (none while paused), instead
+        of in real time on the thread, e.g. as many for every frame drawn, so
+        that the Balls do not depend on timing (lockstep)"""
+
+        if self.settings.paused:
+            return
+
+        with self.lock:
+            for _ in range(steps):
+                records = self.step()
+                if self.record is not None:
+                    self.record(records)
+            self.publish()
+
+    def publish(self, interpolate: bool = True) -> None:
+        """takes a Snapshot of the Balls as they are now
+        if interpolate is False, the last one is dropped, e.g. after editing
+        the Balls, so that they are drawn as they are"""
+
+        snapshot = Snapshot(self.balls, self.frame, time.perf_counter())
+        previous = self.snapshots[1] if interpolate else snapshot
+        self.snapshots = (previous, snapshot)
+
+    @contextlib.contextmanager
+    def edit(self) -> Iterator[world.World]:
+        """holds the lock (between steps) while the Balls are edited, e.g. by
+        the loop of events, and publishes them afterwards"""
+
+        with self.lock:
+            yield self.balls
+            self.publish(interpolate=False)
+
+    def view(self, now: float|None = None) -> Snapshot:
+        """returns the Balls to be drawn at time now (by default, the current
+        time), interpolated between the last two Snapshots
+        they are drawn a batch late, so that they never run ahead of a step"""
+
+        now = time.perf_counter() if now is None else now
+        previous, current = self.snapshots
+        span = max(current.frame - previous.frame, 1) * self.dt
+        alpha = min(max((now - current.time) / span, 0.0), 1.0)
+        return current.interpolate(previous, alpha)
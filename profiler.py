@@ -0,0 +1,118 @@
+from typing import Iterator
+import numpy as np
+import collections
+import contextlib
+import threading
+import json
+import time
+
+
+# Number of frames kept for the percentiles
+WINDOW: int = 1000
+
+# Percentiles reported for every phase and counter
+PERCENTILES: tuple[int] = (50, 99)
+
+
+class Profiler:
+    """
+    represents the timers of the phases of every frame (or step of the
+    physics) and the counters of the work done in them, of which the last
+    window frames are kept to report percentiles
+    a Profiler is ticked by a single thread, but may be read from any
+    attributes:
+        self.window: number of frames kept
+        self.current: time (s) spent in every phase, and every counter, in
+            the current frame
+        self.history: values of every phase and counter in the last frames
+        self.counters: names of the counters (the rest are phases)
+        self.frames: number of frames ticked so far
+        self.last: time (time.perf_counter) of the end of the last lap
+        self.lock: held while the history is changed or read
+    """
+
+    def __init__(self, window: int = WINDOW) -> None:
+        self.window = window
+        self.current: collections.Counter[str] = collections.Counter()
+        self.history: dict[str, collections.deque[float]] = {}
+        self.counters: set[str] = set()
+        self.frames = 0
+        self.last = time.perf_counter()
+        self.lock = threading.Lock()
+
+    @contextlib.contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        """times the block as (a part of) the given phase of the frame"""
+
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.current[name] += time.perf_counter() - start
+
+    def lap(self, name: str) -> None:
+        """times everything since the last lap (or the start of the frame) as
+        (a part of) the given phase of the frame"""
+
+        now = time.perf_counter()
+        self.current[name] += now - self.last
+        self.last = now
+
+    def count(self, name: str, amount: int = 1) -> None:
+        """adds the amount to the given counter of the frame"""
+
+        self.current[name] += amount
+        self.counters.add(name)
+
+    def tick(self) -> None:
+        """ends the current frame, keeping its timers and counters"""
+
+        with self.lock:
+            for name in self.current:
+                if name not in self.history:
+                    history = collections.deque(maxlen=self.window)
+                    history.extend([0.0] * min(self.frames, self.window))
+                    self.history[name] = history
+            for name, history in self.history.items():
+                history.append(self.current.get(name, 0.0))
+            self.frames += 1
+        self.current = collections.Counter()
+        self.last = time.perf_counter()
+
+    def latest(self) -> dict[str, float]:
+        """returns the values of every phase (in ms) and counter in the last
+        frame ticked"""
+
+        with self.lock:
+            return {
+                name: values[-1] * (1 if name in self.counters else 1000)
+                for name, values in self.history.items() if values
+            }
+
+    def summary(self) -> dict[str, dict[str, float]]:
+        """returns the percentiles (see PERCENTILES) of every phase (in ms)
+        and counter over the last frames"""
+
+        with self.lock:
+            history = {
+                name: list(values) for name, values in self.history.items()
+            }
+
+        summary = {}
+        for name, values in history.items():
+            scale = 1 if name in self.counters else 1000
+            points = np.percentile(np.array(values) * scale, PERCENTILES)
+            summary[name] = {
+                f"p{p}": float(point) for p, point in zip(PERCENTILES, points)
+            }
+        return summary
+
+
+def export(path: str, **profilers: Profiler) -> None:
+    """writes the summaries of the given profilers (by name) as JSON"""
+
+    with open(path, "w") as file:
+        json.dump({
+            name: {"count": profiler.frames, **profiler.summary()}
+            for name, profiler in profilers.items()
+        }, file, indent=2)
@@ -0,0 +1,163 @@
+from typing import Iterable
+import collisions
+import numpy as np
+import world
+import os
+
+
+# Columns of the Balls stored in every frame, in order: name -> (row, dtype)
+COLUMNS: dict[str, tuple[tuple[int, ...], type]] = {
+    "ids": ((), np.int64),
+    "position": ((2,), np.float64),
+    "velocity": ((2,), np.float64),
+    "radius": ((), np.float64),
+    "density": ((), np.float64),
+    "color": ((3,), np.uint8),
+}
+
+# Files of a recording (which is a directory)
+FRAMES: str = "frames.bin"
+INDEX: str = "index.bin"
+EVENTS: str = "events.bin"
+
+# Every collision event is stored as (frame, id, other id or -1, wall or -1)
+EVENT = np.dtype([
+    ("frame", np.int64), ("first", np.int64), ("second", np.int64),
+    ("wall", np.int64)
+])
+
+# Every frame is indexed by (offset into FRAMES, number of Balls)
+ENTRY = np.dtype([("offset", np.int64), ("count", np.int64)])
+
+
+def size(count: int) -> int:
+    """returns the number of bytes taken by a frame of count Balls
+    padded to 8 bytes, so that every column of every frame stays aligned"""
+
+    total = sum(
+        count * int(np.prod(shape)) * np.dtype(dtype).itemsize
+        for shape, dtype in COLUMNS.values()
+    )
+    return -(-total // 8) * 8
+
+
+class Recorder:
+    """
+    represents a stream of the state of the Balls in every frame (in columns)
+    and of the collisions occurring in them, written into a directory
+    attributes:
+        self.path: the directory holding the recording
+        self.frames, self.index, self.events: the files being written
+        self.count: number of frames written so far
+        self.offset: size (in bytes) of the frames written so far
+    """
+
+    def __init__(self, path: str) -> None:
+        os.makedirs(path, exist_ok=True)
+        self.path = path
+        self.frames = open(os.path.join(path, FRAMES), "wb")
+        self.index = open(os.path.join(path, INDEX), "wb")
+        self.events = open(os.path.join(path, EVENTS), "wb")
+        self.count = self.offset = 0
+
+    def __enter__(self) -> "Recorder":
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def write(
+            self, balls: world.World,
+            events: Iterable[collisions.Collision] = ()
+        ) -> int:
+        """appends the current state of the Balls as a new frame, along with
+        its collisions (numbered by the frames of the recording)
+        returns the number of the frame"""
+
+        frame, written = self.count, 0
+        for name, (shape, dtype) in COLUMNS.items():
+            column = balls.precise() if name == "position" else (
+                getattr(balls, name)
+            )
+            column = np.ascontiguousarray(column, dtype)
+            written += self.frames.write(column.data)
+        self.frames.write(bytes(size(len(balls)) - written))
+
+        entry = np.array((self.offset, len(balls)), dtype=ENTRY)
+        self.index.write(entry.tobytes())
+
+        events = [(frame, *event[1:]) for event in events]
+        if events:
+            self.events.write(np.array(events, dtype=EVENT).tobytes())
+
+        self.count, self.offset = frame + 1, self.offset + size(len(balls))
+        return frame
+
+    def flush(self) -> None:
+        """flushes the frames written so far, e.g. for a running Replay"""
+
+        for file in (self.frames, self.index, self.events):
+            file.flush()
+
+    def close(self) -> None:
+        """flushes and closes the files of the recording"""
+
+        for file in (self.frames, self.index, self.events):
+            file.close()
+
+
+class Replay:
+    """
+    represents a recording opened for reading, with its files memory-mapped
+    so that any frame can be read without reading the ones before it
+    attributes:
+        self.path: the directory holding the recording
+        self.frames: the memory-mapped frames (as bytes)
+        self.index: (offset, count) of every frame
+        self.events: every collision event, ordered by frame
+    """
+
+    def __init__(self, path: str) -> None:
+        self.path = path
+        self.frames = self.map(FRAMES, np.uint8)
+        self.index = self.map(INDEX, ENTRY)
+        self.events = self.map(EVENTS, EVENT)
+
+    def __len__(self) -> int:
+        return len(self.index)
+
+    def map(self, name: str, dtype: np.dtype) -> np.ndarray:
+        """returns the given file of the recording mapped as an array"""
+
+        path = os.path.join(self.path, name)
+        if not os.path.getsize(path):
+            return np.empty(0, dtype=dtype)
+        return np.memmap(path, dtype=dtype, mode="r")
+
+    def frame(self, n: int) -> dict[str, np.ndarray]:
+        """returns the columns of the Balls in frame n (views into the file)"""
+
+        offset, count = self.index[n].tolist()
+        columns = {}
+        for name, (shape, dtype) in COLUMNS.items():
+            column = np.dtype(dtype).itemsize * count * int(np.prod(shape))
+            data = self.frames[offset:offset+column].view(dtype)
+            columns[name] = data.reshape(count, *shape)
+            offset += column
+        return columns
+
+    def collisions(self, n: int) -> np.ndarray:
+        """returns the collision events of frame n"""
+
+        start, stop = np.searchsorted(self.events["frame"], (n, n+1))
+        return self.events[start:stop]
+
+    def load(self, n: int, balls: world.World) -> None:
+        """replaces the Balls of the given World with those of frame n"""
+
+        balls.clear()
+        columns = self.frame(n)
+        balls.extend(
+            columns["color"], columns["radius"], columns["position"],
+            columns["velocity"], columns["density"], ids=columns["ids"]
+        )
@@ -0,0 +1,221 @@
+from generator import Color
+from typing import Callable
+import functools
+import numpy as np
+import physics
+import world
+import pygame
+import math
+
+
+# Dirty rectangles above which the whole window is redrawn (and updated)
+# instead, e.g. when many Balls move
+DIRTY: int = 256
+
+# Bytes of sprites of Balls kept, the Balls beyond are drawn directly
+MEMORY: int = 64 * 2**20
+
+# Width of the outline of the Balls
+OUTLINE: int = 3
+
+# Colors of the outline and of the transparent pixels of the sprites
+BLACK: Color = (0, 0, 0)
+KEY: Color = (255, 0, 255)
+
+
+@functools.lru_cache(maxsize=256)
+def text(font: pygame.font.Font, string: str, color: Color) -> pygame.Surface:
+    """returns the rendered text, rendering every (font, text, color) once"""
+
+    return font.render(string, 1, color)
+
+
+def sprite(radius: float, color: Color) -> pygame.Surface:
+    """returns a new sprite of a Ball of given radius and color, i.e. the
+    Ball with its outline (drawn as by main.draw_balls), centred in it"""
+
+    center = math.ceil(radius + OUTLINE)
+    side = 2*center + 1
+    key = KEY if color != KEY else (254, 0, 255)
+
+    image = pygame.Surface((side, side))
+    image.fill(key)
+    pygame.draw.circle(
+        image, BLACK, (center, center), radius+OUTLINE, width=OUTLINE
+    )
+    pygame.draw.circle(image, color, (center, center), radius)
+    image.set_colorkey(key, pygame.RLEACCEL)
+    return image
+
+
+class Renderer:
+    """
+    represents the drawing of frames onto a window, in which only what
+    changed since the last frame is redrawn (and updated on the screen)
+    the background is drawn once, text is rendered once and every Ball is
+    blitted from a sprite (one per radius and color), all in a single batch
+    attributes:
+        self.window: the Surface drawn onto
+        self.background: the background of the window (see self.begin)
+        self.key: what the background was drawn for, if anything
+        self.sprites: sprite of every (radius, color) drawn so far, with the
+            color packed as 0xRRGGBB
+        self.memory: number of bytes of the sprites
+        self.dirty: rectangles drawn onto in the current frame
+        self.previous: rectangles drawn onto in the last frame, or None if
+            the whole window has to be redrawn
+    """
+
+    def __init__(self, window: pygame.Surface) -> None:
+        self.window = window
+        self.background = pygame.Surface(window.get_size())
+        self.key: object = None
+        self.sprites: dict[tuple[float, int], pygame.Surface] = {}
+        self.memory = 0
+        self.dirty: list[pygame.Rect]|None = []
+        self.previous: list[pygame.Rect]|None = None
+
+    def invalidate(self) -> None:
+        """makes the next frame redraw (and update) the whole window"""
+
+        self.key = self.previous = None
+
+    def begin(
+            self, key: object, paint: Callable[[pygame.Surface], None]
+        ) -> None:
+        """starts a frame: paint(background) draws the background, which is
+        only done again if the given key changes, and whatever was drawn over
+        it in the last frame is erased"""
+
+        if key != self.key:
+            paint(self.background)
+            self.key, self.previous = key, None
+
+        if self.previous is None:
+            self.window.blit(self.background, (0, 0))
+        else:
+            self.window.blits(
+                [(self.background, rect, rect) for rect in self.previous],
+                doreturn=False
+            )
+        self.dirty = []
+
+    def mark(self, rect: pygame.Rect) -> pygame.Rect:
+        """records a rectangle drawn onto in the current frame"""
+
+        if self.dirty is not None:
+            self.dirty.append(rect)
+            if len(self.dirty) > DIRTY:
+                self.dirty = None
+        return rect
+
+    def blit(
+            self, surface: pygame.Surface, position: tuple[float, float]
+        ) -> pygame.Rect:
+        """blits the surface at position and records where"""
+
+        return self.mark(self.window.blit(surface, position))
+
+    def sprite(self, radius: float, color: int) -> pygame.Surface|None:
+        """returns the sprite of a Ball of given radius and (packed) color,
+        or None if there is no room for it (see MEMORY)"""
+
+        if (image := self.sprites.get((radius, color))) is not None:
+            return image
+
+        side = 2*math.ceil(radius + OUTLINE) + 1
+        if self.memory + 4*side*side > MEMORY:
+            return None
+        rgb = (color >> 16, (color >> 8) & 255, color & 255)
+        image = self.sprites[radius, color] = sprite(radius, rgb)
+        self.memory += 4*side*side
+        return image
+
+    def balls(
+            self, balls: world.World|physics.Snapshot, vector: bool = False
+        ) -> int:
+        """draws the Balls (lying at least partly in the window) in a batch
+        if vector is True, draw the velocity vectors of the Balls
+        returns the number of Balls drawn"""
+
+        if not len(balls):
+            return 0
+
+        reach = (balls.radius + OUTLINE)[:, None]
+        low, high = balls.position - reach, balls.position + reach
+        if vector:
+            ends = balls.position + balls.velocity
+            low, high = np.minimum(low, ends-4), np.maximum(high, ends+4)
+        visible = np.flatnonzero(
+            (high >= 0).all(axis=1) & (low < self.window.get_size()).all(axis=1)
+        )
+
+        positions, radii = balls.position[visible], balls.radius[visible]
+        colors = balls.color[visible].astype(np.int64)
+        colors = colors[:, 0] << 16 | colors[:, 1] << 8 | colors[:, 2]
+
+        if vector:
+            rgb = list(map(tuple, balls.color[visible].tolist()))
+            self.vectors(positions, balls.velocity[visible], rgb)
+
+        # every sprite is (2*offset + 1) wide, with the Ball at its centre
+        offsets = np.ceil(radii + OUTLINE).astype(np.int64)[:, None]
+        corners = np.rint(positions).astype(np.int64) - offsets
+        keys = zip(radii.tolist(), colors.tolist())
+        images = [self.sprites.get(key) or self.sprite(*key) for key in keys]
+        batch = zip(images, corners.tolist())
+
+        missing = [row for row, image in enumerate(images) if image is None]
+        if missing:
+            batch = [(image, corner) for image, corner in batch if image]
+
+        doreturn = self.dirty is not None and len(images) <= DIRTY
+        rects = self.window.blits(batch, doreturn=doreturn)
+        if not doreturn:
+            self.dirty = None
+        for rect in rects or ():
+            self.mark(rect)
+
+        for row in missing:
+            center = (corners[row] + offsets[row]).tolist()
+            color = tuple(balls.color[visible[row]].tolist())
+            self.mark(pygame.draw.circle(
+                self.window, BLACK, center, radii[row]+OUTLINE, width=OUTLINE
+            ))
+            pygame.draw.circle(self.window, color, center, radii[row])
+
+        return len(visible)
+
+    def vectors(
+            self, positions: np.ndarray, velocities: np.ndarray,
+            colors: list[Color]
+        ) -> None:
+        """draws the velocity vectors of Balls at given positions, each as a
+        line ending in a tapering head"""
+
+        ends = positions + velocities
+        speeds = np.hypot(velocities[:, 0], velocities[:, 1])
+        units = velocities / np.where(speeds > 0, speeds, 1)[:, None]
+        normals = units[:, ::-1] * (-1, 1)
+
+        for start, end, unit, normal, color in zip(
+                positions.tolist(), ends.tolist(), (8*units).tolist(),
+                (4*normals).tolist(), colors
+            ):
+            self.mark(pygame.draw.line(self.window, color, start, end, width=2))
+            if unit[0] or unit[1]:
+                base = (end[0] - unit[0], end[1] - unit[1])
+                self.mark(pygame.draw.polygon(self.window, color, (
+                    end, (base[0] + normal[0], base[1] + normal[1]),
+                    (base[0] - normal[0], base[1] - normal[1])
+                )))
+                self.mark(pygame.draw.circle(self.window, color, base, 4))
+
+    def present(self) -> None:
+        """updates the screen with the current frame"""
+
+        if self.previous is None or self.dirty is None:
+            pygame.display.update()
+        else:
+            pygame.display.update(self.previous + self.dirty)
+        self.previous, self.dirty = self.dirty, []
@@ -1,7 +1,3 @@
-import tkinter as tk
-import tkinter.messagebox as msg
-
-
 # Coefficient of Restitution
 E: float = 1.0
 
@@ -17,7 +13,10 @@ def select(e: float) -> None:
 def main(current: float) -> float:
     """prompts to change the value of e by selecting from a Slider
     current is the current value of e"""
-    global root, E
+    global root, E, tk
+
+    # tkinter is only needed for the menu, the value of e is used headless
+    import tkinter as tk
 
     root = tk.Tk()
     root.title("Change Coefficient of Restitution")
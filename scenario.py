@@ -0,0 +1,130 @@
+from dataclasses import dataclass, field, fields
+from generator import Ball, Point
+from typing import Any
+import gravitation
+import checkpoint
+import spawner
+import world
+import json
+
+
+# Defaults, same as those of the interactive Simulator (see main.py)
+FPS: int = 100
+LIMITS: tuple[float, float] = (13, 615)
+PLANET: str = "EARTH"
+
+
+@dataclass
+class Scenario:
+    """
+    represents the initial state and the settings of a simulation
+    attributes:
+        self.balls: the Balls at the start of the simulation
+        self.limits: lower and upper limits (i.e. positions of the Walls)
+        self.e: coefficient of restitution
+        self.gravity: whether gravity is ON
+        self.acc: acceleration due to gravity (scaled by FPS, as in main.py)
+        self.direction: direction of gravity, one of +y, -y, +x, -x
+        self.dt: time advanced in every step
+        self.ccd: whether impacts are resolved at their exact instants (see
+            ccd.advance), so that fast Balls do not tunnel
+        self.sleep: whether Balls at rest are put to sleep (see
+            world.World.update), which is not done along with ccd
+        self.solver: whether contacts are solved as constraints (see
+            solver.Solver), which is not done along with ccd either
+        self.ordered: whether the Balls are collided in canonical order (see
+            world.World.canonical), so that runs are bit-identical however
+            the Balls are ordered
+        self.compact: whether the Balls are stored in single precision (see
+            world.COMPACT), e.g. for runs of a million Balls
+        self.accumulate: whether compact positions keep what they lose to
+            rounding (see world.RESIDUAL), which also makes them compact
+        self.checkpoint: path of a checkpoint to start from (see checkpoint.py)
+            instead of the Balls, e.g. to fork a long run into many branches
+        self.spawn: arguments of spawner.spawn (count, distributions of the
+            Balls and seed), if Balls are spawned along with the Balls
+    """
+
+    balls: list[Ball] = field(default_factory=list)
+    limits: tuple[float, float] = LIMITS
+    e: float = 1.0
+    gravity: bool = True
+    acc: float = gravitation.g[PLANET] * FPS
+    direction: str = "+y"
+    dt: float = 1 / FPS
+    ccd: bool = False
+    sleep: bool = False
+    solver: bool = False
+    ordered: bool = False
+    compact: bool = False
+    accumulate: bool = False
+    checkpoint: str|None = None
+    spawn: dict[str, Any]|None = None
+
+    def build(self, contacts: "solver.Solver|None" = None) -> world.World:
+        """returns a new World holding the Balls of the scenario, or those of
+        its checkpoint, whose impulses are restored into contacts, if given"""
+
+        compact = self.compact or self.accumulate
+        if self.checkpoint is not None:
+            balls = world.World(compact=compact, accumulate=self.accumulate)
+            return checkpoint.load(self.checkpoint, balls, contacts)[0]
+
+        count = len(self.balls) + (self.spawn or {}).get("count", 0)
+        balls = world.World(
+            self.balls, capacity=max(count, 1), compact=compact,
+            accumulate=self.accumulate
+        )
+        if self.spawn is not None:
+            spawner.fill(balls, limits=self.limits, **self.spawn)
+        return balls
+
+    def settings(self) -> dict[str, Any]:
+        """returns the settings of the scenario (all but its Balls)"""
+
+        return {
+            item.name: getattr(self, item.name) for item in fields(self)
+            if item.name != "balls"
+        }
+
+
+def ball(data: dict) -> Ball:
+    """returns the Ball described by the given dict"""
+
+    return Ball(
+        tuple(data.get("color", (0, 0, 0))), float(data["radius"]),
+        tuple(data["position"]), tuple(data.get("velocity", (0.0, 0.0))),
+        float(data.get("density", 1.0))
+    )
+
+
+def parse(data: dict) -> Scenario:
+    """returns the Scenario described by the given dict
+    g is given either as the name of a 'planet' (see gravitation.g) or as a
+    value of 'g', it is scaled by 'fps' in the same way as in main.py"""
+
+    fps = data.get("fps", FPS)
+    if "g" in data:
+        acc = float(data["g"]) * fps
+    else:
+        acc = gravitation.g[data.get("planet", PLANET).upper()] * fps
+
+    return Scenario(
+        balls=[ball(item) for item in data.get("balls", [])],
+        limits=tuple(data.get("limits", LIMITS)), e=float(data.get("e", 1.0)),
+        gravity=bool(data.get("gravity", True)), acc=acc,
+        direction=data.get("direction", "+y"), dt=float(data.get("dt", 1/fps)),
+        ccd=bool(data.get("ccd", False)), sleep=bool(data.get("sleep", False)),
+        solver=bool(data.get("solver", False)),
+        ordered=bool(data.get("ordered", False)),
+        compact=bool(data.get("compact", False)),
+        accumulate=bool(data.get("accumulate", False)),
+        checkpoint=data.get("checkpoint"), spawn=data.get("spawn")
+    )
+
+
+def load(path: str) -> Scenario:
+    """returns the Scenario stored in the given JSON file"""
+
+    with open(path) as file:
+        return parse(json.load(file))
@@ -0,0 +1,174 @@
+import numpy as np
+
+
+# Iterations over the contacts in every step, for velocities and positions
+ITERATIONS: int = 8
+CORRECTIONS: int = 3
+
+# Fraction of the overlap of every contact removed in each correction, and
+# overlap allowed to remain (so that resting contacts stay touching)
+BETA: float = 0.2
+SLOP: float = 0.5
+
+# Speed of approach below which contacts do not bounce, so that Balls resting
+# on one-another (or on a Wall) do not jitter
+REST: float = 1.0
+
+# Normals of the Walls (Upper, Lower, Left, Right), pointing into the Box
+NORMALS: np.ndarray = np.array([(0, 1), (0, -1), (1, 0), (-1, 0)], dtype=float)
+
+
+class Solver:
+    """
+    represents a solver of the contacts of the Balls (with one-another and
+    with the Walls) as constraints, instead of colliding them pair by pair
+    every step runs a few Jacobi iterations of impulses over all the contacts
+    at once, starting from the impulses of the last step (warm starting), and
+    then pushes the Balls overlapping apart (positional correction)
+    attributes:
+        self.iterations: iterations over the velocities in every step
+        self.corrections: iterations over the positions in every step
+        self.impulses: impulse of every contact in the last step, by the ids
+            of its Balls, (-1 - wall, id) for a contact with a Wall
+    """
+
+    def __init__(
+            self, iterations: int = ITERATIONS, corrections: int = CORRECTIONS
+        ) -> None:
+        self.iterations, self.corrections = iterations, corrections
+        self.impulses: dict[tuple[int, int], float] = {}
+
+    def solve(
+            self, balls: "world.World", pairs: list[tuple[int, int]],
+            rows: np.ndarray, walls: np.ndarray, limits: tuple[float, float],
+            e: float, asleep: np.ndarray|None = None
+        ) -> None:
+        """solves the contacts of the Balls in the given pairs of rows, and
+        of the Balls in rows with the given walls (keys of collisions.WALLS)
+        lying at the given limits
+        Balls (in rows) asleep, if given, do not move unless they are hit by a
+        Ball that was not still, which wakes them
+        Walls keep bouncing the Balls back with their full speed, as in
+        world.World.handle, and Balls with one-another with restitution e"""
+
+        count = len(balls)
+        first, second = np.array(pairs, dtype=np.int64).reshape(-1, 2).T
+        if asleep is not None:
+            asleep = self.wake(balls, first, second, asleep)
+
+        # the Walls are a single extra row, which never moves
+        a = np.concatenate((first, np.full(len(rows), count)))
+        b = np.concatenate((second, rows))
+        e = np.concatenate((np.full(len(first), e), np.ones(len(rows))))
+
+        inverse = np.append(1 / balls.mass, 0.0)
+        if asleep is not None:
+            inverse[:count][asleep] = 0.0
+        velocity = np.vstack((balls.velocity, np.zeros((1, 2))))
+        normal = np.vstack((
+            self.normals(balls.position, first, second), NORMALS[walls]
+        ))
+
+        # Balls with many contacts share the correction among them
+        contacts = np.bincount(np.concatenate((a, b)), minlength=count+1)
+        contacts[count] = 1
+        relax = 1 / np.maximum(contacts[a], contacts[b])
+        mass = inverse[a] + inverse[b]
+        reduced = np.where(mass > 0, relax / np.where(mass > 0, mass, 1), 0.0)
+
+        ids = balls.ids.tolist() + [-1]
+        keys = [
+            (ids[i] if i < count else -1 - wall, ids[j])
+            for i, j, wall in zip(
+                a.tolist(), b.tolist(), [0]*len(first) + walls.tolist()
+            )
+        ]
+        impulse = np.array([self.impulses.get(key, 0.0) for key in keys])
+
+        approach = ((velocity[b] - velocity[a]) * normal).sum(axis=1)
+        target = np.where(approach < -REST, -e * approach, 0.0)
+        apply(velocity, inverse, a, b, normal, impulse)
+
+        for _ in range(self.iterations):
+            speed = ((velocity[b] - velocity[a]) * normal).sum(axis=1)
+            total = np.maximum(impulse + (target - speed) * reduced, 0.0)
+            apply(velocity, inverse, a, b, normal, total - impulse)
+            impulse = total
+
+        balls.velocity = velocity[:count]
+        self.impulses = dict(zip(keys, impulse.tolist()))
+        self.correct(
+            balls, inverse, first, second, rows, walls, limits, reduced
+        )
+
+    def wake(
+            self, balls: "world.World", first: np.ndarray, second: np.ndarray,
+            asleep: np.ndarray
+        ) -> np.ndarray:
+        """wakes the Balls asleep in contact with Balls that were not still
+        returns which Balls are still asleep"""
+
+        moving = balls.still == 0
+        hit = np.concatenate((
+            first[asleep[first] & moving[second]],
+            second[asleep[second] & moving[first]]
+        ))
+        balls.still[hit] = 0
+        return balls.asleep()
+
+    def normals(
+            self, position: np.ndarray, first: np.ndarray, second: np.ndarray
+        ) -> np.ndarray:
+        """returns the unit vectors from the first to the second Ball of every
+        pair, (1, 0) for Balls at the same position"""
+
+        direction = position[second] - position[first]
+        distance = np.hypot(direction[:, 0], direction[:, 1])
+        normal = direction / np.where(distance > 0, distance, 1)[:, None]
+        normal[distance == 0] = (1.0, 0.0)
+        return normal
+
+    def correct(
+            self, balls: "world.World", inverse: np.ndarray,
+            first: np.ndarray, second: np.ndarray, rows: np.ndarray,
+            walls: np.ndarray, limits: tuple[float, float], reduced: np.ndarray
+        ) -> None:
+        """pushes the Balls of the contacts apart (and away from the Walls)
+        by a fraction BETA of their overlap beyond SLOP"""
+
+        count, (lower, upper) = len(balls), limits
+        radius = balls.radius
+        position = np.vstack((balls.position, np.zeros((1, 2))))
+        a = np.concatenate((first, np.full(len(rows), count)))
+        b = np.concatenate((second, rows))
+
+        for _ in range(self.corrections):
+            normal = self.normals(position, first, second)
+            direction = position[second] - position[first]
+            distance = (direction * normal).sum(axis=1)
+            gaps = np.stack((
+                position[rows, 1] - lower, upper - position[rows, 1],
+                position[rows, 0] - lower, upper - position[rows, 0]
+            ), axis=1)[np.arange(len(rows)), walls]
+
+            overlap = np.concatenate((
+                radius[first] + radius[second] - distance, radius[rows] - gaps
+            ))
+            normal = np.vstack((normal, NORMALS[walls]))
+            push = np.maximum(overlap - SLOP, 0.0) * BETA * reduced
+            apply(position, inverse, a, b, normal, push)
+
+        balls.position = position[:count]
+
+
+def apply(
+        vectors: np.ndarray, inverse: np.ndarray, a: np.ndarray, b: np.ndarray,
+        normal: np.ndarray, amount: np.ndarray
+    ) -> None:
+    """applies the given amounts along the normals of the contacts (a, b)
+    to the vectors (velocities or positions) of their rows, moving a against
+    and b along the normal, in inverse proportion to their masses"""
+
+    step = amount[:, None] * normal
+    np.add.at(vectors, a, -step * inverse[a, None])
+    np.add.at(vectors, b, step * inverse[b, None])
@@ -0,0 +1,117 @@
+from typing import Callable
+import threading
+import queue
+
+
+# A backend plays a sound of given frequency (Hz) for given duration (ms)
+Backend = Callable[[int, int], None]
+
+# Duration (ms) of a Beep played on a collision
+DURATION: int = 10
+
+# Number of frames whose sounds may wait to be played, the rest are dropped
+FRAMES: int = 4
+
+
+def null(frequency: int, duration: int) -> None:
+    """backend that plays nothing, e.g. on Linux"""
+
+
+class Recorder:
+    """
+    represents a backend that records the sounds instead of playing them
+    attributes:
+        self.sounds: (frequency, duration) of every played sound, in order
+    """
+
+    def __init__(self) -> None:
+        self.sounds: list[tuple[int, int]] = []
+
+    def __call__(self, frequency: int, duration: int) -> None:
+        self.sounds.append((frequency, duration))
+
+
+def default() -> Backend:
+    """returns winsound.Beep if available (on Windows), else the null backend"""
+
+    try:
+        import winsound
+    except ImportError:
+        return null
+    return winsound.Beep
+
+
+def alert() -> None:
+    """plays the sound of the system on exiting (without waiting for it), if
+    winsound is available (on Windows), e.g. on selecting a Ball"""
+
+    try:
+        import winsound
+    except ImportError:
+        return
+    winsound.PlaySound("SystemExit", winsound.SND_ASYNC)
+
+
+class Dispatcher:
+    """
+    represents a player of collision sounds that never blocks the simulation
+    sounds of a frame are coalesced by frequency and handed to a worker thread
+    through a bounded queue, dropping the frames that do not fit in it
+    attributes:
+        self.backend: the Backend playing the sounds
+        self.duration: duration (ms) of every sound
+        self.frame: the frequencies collected in the current frame
+        self.queue: the frames waiting to be played by the worker
+        self.dropped: number of frames dropped so far
+    """
+
+    def __init__(
+            self, backend: Backend = null, duration: int = DURATION,
+            frames: int = FRAMES
+        ) -> None:
+        self.backend, self.duration = backend, duration
+        self.frame: set[int] = set()
+        self.queue: queue.Queue[tuple[int, ...]|None] = queue.Queue(frames)
+        self.dropped = 0
+
+        self.worker = threading.Thread(target=self.work, daemon=True)
+        self.worker.start()
+
+    def play(self, frequency: int) -> None:
+        """collects the sound of a collision of given frequency
+        sounds sharing a frequency within a frame are played only once"""
+
+        self.frame.add(frequency)
+
+    def flush(self) -> None:
+        """hands the sounds collected in the current frame to the worker
+        drops them if the worker is still busy with earlier frames"""
+
+        if not self.frame:
+            return
+
+        try:
+            self.queue.put_nowait(tuple(sorted(self.frame)))
+        except queue.Full:
+            self.dropped += 1
+        self.frame.clear()
+
+    def work(self) -> None:
+        """plays the queued frames until the Dispatcher is closed"""
+
+        while (frame := self.queue.get()) is not None:
+            for frequency in frame:
+                self.backend(frequency, self.duration)
+            self.queue.task_done()
+        self.queue.task_done()
+
+    def join(self) -> None:
+        """waits until all the queued frames have been played"""
+
+        self.queue.join()
+
+    def close(self) -> None:
+        """stops the worker once the queued frames have been played"""
+
+        self.queue.put(None)
+        self.worker.join()
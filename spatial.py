@@ -0,0 +1,95 @@
+from generator import Point
+import collisions
+import numpy as np
+
+
+# Cell given to Balls not yet placed in the Index (i.e. added since it was
+# last refreshed), which no Ball can lie in
+UNPLACED: tuple[int, int] = (np.iinfo(np.int64).min, np.iinfo(np.int64).min)
+
+
+class Index:
+    """
+    represents a uniform grid over the Balls of a World, every (non-empty) cell
+    holding the ids of the Balls whose centres lie in it, so that the Balls at
+    a point or within a region are found without testing all of them
+    the cell of every Ball is kept in a column of the World, and refreshing
+    the Index moves only the Balls that left their cell since the last refresh
+    attributes:
+        self.size: side of every cell
+        self.buckets: ids of the Balls in every cell, by (column, row) of cell
+    """
+
+    def __init__(self, size: float = collisions.CELL) -> None:
+        self.size = size
+        self.buckets: dict[tuple[int, int], set[int]] = {}
+
+    def __len__(self) -> int:
+        return sum(map(len, self.buckets.values()))
+
+    def cell(self, point: Point) -> tuple[int, int]:
+        """returns the cell in which the given point lies"""
+
+        x, y = point
+        return int(np.floor(x / self.size)), int(np.floor(y / self.size))
+
+    def refresh(
+            self, ids: np.ndarray, positions: np.ndarray, cells: np.ndarray
+        ) -> None:
+        """moves the Balls (given as columns) into the cells of their current
+        positions, updating cells (their cells at the last refresh) in place"""
+
+        current = np.floor(positions / self.size).astype(np.int64)
+        moved = np.flatnonzero((current != cells).any(axis=1))
+        if not len(moved):
+            return
+
+        for id, old, new in zip(
+                ids[moved].tolist(), cells[moved].tolist(),
+                current[moved].tolist()
+            ):
+            self.discard(id, tuple(old))
+            self.buckets.setdefault(tuple(new), set()).add(id)
+        cells[moved] = current[moved]
+
+    def discard(self, id: int, cell: tuple[int, int]) -> None:
+        """removes the Ball of given id from the given cell, if it is in it"""
+
+        bucket = self.buckets.get(cell)
+        if bucket is None:
+            return
+        bucket.discard(id)
+        if not bucket:
+            del self.buckets[cell]
+
+    def remove(self, ids: np.ndarray, cells: np.ndarray) -> None:
+        """removes the Balls (given as columns) from their given cells"""
+
+        for id, cell in zip(ids.tolist(), cells.tolist()):
+            self.discard(id, tuple(cell))
+
+    def clear(self) -> None:
+        """removes all the Balls"""
+
+        self.buckets.clear()
+
+    def near(self, low: Point, high: Point, reach: float) -> list[int]:
+        """returns the ids of the Balls whose centres may lie within reach of
+        the rectangle from low to high, in no particular order"""
+
+        (x0, y0), (x1, y1) = low, high
+        c0, r0 = self.cell((x0 - reach, y0 - reach))
+        c1, r1 = self.cell((x1 + reach, y1 + reach))
+
+        # wide regions hold more cells than there are Balls, walk the Balls
+        if (c1 - c0 + 1) * (r1 - r0 + 1) > len(self.buckets):
+            return [
+                id for (c, r), bucket in self.buckets.items()
+                if c0 <= c <= c1 and r0 <= r <= r1 for id in bucket
+            ]
+
+        ids = []
+        for c in range(c0, c1 + 1):
+            for r in range(r0, r1 + 1):
+                ids.extend(self.buckets.get((c, r), ()))
+        return ids
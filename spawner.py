@@ -0,0 +1,138 @@
+from generator import Color
+from typing import Any
+import generator
+import numpy as np
+import world
+
+
+# A distribution is a value, a range [low, high] (drawn uniformly) or a dict
+# {"choice": [values]} (drawn from the values)
+Distribution = float|list[float]|tuple[float, float]|dict[str, list]
+
+# Defaults, drawn the same as the Balls spawned with the mouse (with radii
+# scaled down, if need be, for the Balls to fit in the Box, see spawn)
+RADIUS: Distribution = {"choice": generator.RADII.values}
+DENSITY: Distribution = {"choice": generator.DENSITIES.values}
+SPEED: Distribution = [0.0, 200.0]
+SEED: int = 0
+
+
+def sample(
+        rng: np.random.Generator, spec: Distribution, count: int
+    ) -> np.ndarray:
+    """returns count values drawn from the given distribution"""
+
+    if isinstance(spec, dict):
+        return rng.choice(np.asarray(spec["choice"], dtype=float), count)
+    if isinstance(spec, (list, tuple)):
+        low, high = spec
+        return rng.uniform(low, high, count)
+    return np.full(count, float(spec))
+
+
+def colors(
+        rng: np.random.Generator, spec: Color|dict[str, list]|None, count: int
+    ) -> np.ndarray:
+    """returns count colors: random ones (as generator.color) if spec is
+    None, else the given color or ones drawn from {"choice": [colors]}"""
+
+    if spec is None:
+        return rng.integers(0, 256, (count, 3), dtype=np.uint8)
+    if isinstance(spec, dict):
+        choices = np.asarray(spec["choice"], dtype=np.uint8).reshape(-1, 3)
+        return choices[rng.integers(len(choices), size=count)]
+    return np.tile(np.asarray(spec, dtype=np.uint8), (count, 1))
+
+
+def taken(
+        position: np.ndarray, radius: np.ndarray, lower: float, side: float,
+        cells: int
+    ) -> np.ndarray:
+    """returns whether every cell of the grid (of cells by cells, each of the
+    given side, from lower) is reached by any of the given Balls"""
+
+    low = np.floor((position - radius[:, None] - lower) / side).astype(int)
+    high = np.floor((position + radius[:, None] - lower) / side).astype(int)
+    low, high = np.clip(low, 0, cells - 1), np.clip(high, 0, cells - 1)
+
+    grid = np.zeros((cells, cells), dtype=bool)
+    span = int((high - low).max(initial=0)) + 1
+    for dx in range(span):
+        for dy in range(span):
+            column, row = low[:, 0] + dx, low[:, 1] + dy
+            inside = (column <= high[:, 0]) & (row <= high[:, 1])
+            grid[column[inside], row[inside]] = True
+    return grid
+
+
+def spawn(
+        count: int, limits: tuple[float, float],
+        radius: Distribution|None = None, density: Distribution = DENSITY,
+        speed: Distribution = SPEED, color: Color|dict|None = None,
+        seed: int = SEED,
+        occupied: tuple[np.ndarray, np.ndarray]|None = None
+    ) -> dict[str, np.ndarray]:
+    """returns the columns (color, radius, position, velocity, density) of
+    count Balls placed without overlap between the given limits, moving in
+    random directions, the same ones for the same seed
+    every Ball lies in its own cell of a grid (as wide as the largest Ball),
+    at a random offset within it, leaving out the cells reached by the Balls
+    occupied (positions and radii), if given
+    radius defaults to RADIUS, scaled down (if need be) so that the cells of
+    the grid are as many as the Balls, along with those occupied
+    raises ValueError if there are more Balls than free cells to place them
+    in, naming the parameters to change"""
+
+    rng = np.random.default_rng(seed)
+    radii = sample(rng, RADIUS if radius is None else radius, count)
+    largest = float(radii.max(initial=0.0))
+    if largest <= 0 and count:
+        raise ValueError("the radii of the Balls must be positive")
+
+    lower, upper = limits
+    if radius is None and count:
+        total = count + (0 if occupied is None else len(occupied[1]))
+        fit = (upper - lower) / (2 * np.ceil(np.sqrt(total))) * (1 - 1e-9)
+        radii *= min(1.0, fit / largest)
+        largest = float(radii.max())
+
+    side = 2 * largest
+    cells = int((upper - lower) // side) if count else 0
+    available = None
+    if occupied is not None and len(occupied[1]):
+        available = np.flatnonzero(~taken(*occupied, lower, side, cells))
+    free = cells**2 if available is None else len(available)
+    if count > free:
+        raise ValueError(
+            f"{count} Balls of radius up to {largest} do not fit in the Box "
+            f"without overlapping (at most {free}), spawn them with a smaller "
+            f"'radius', or fewer of them ('count')"
+        )
+
+    chosen = rng.choice(free, count, replace=False)
+    if available is not None:
+        chosen = available[chosen]
+    corners = lower + np.stack((chosen // cells, chosen % cells), axis=1) * side
+    room = (side - 2*radii)[:, None]
+    positions = corners + radii[:, None] + rng.random((count, 2)) * room
+
+    angles = rng.uniform(0, 2*np.pi, count)
+    speeds = sample(rng, speed, count)
+    velocities = np.stack((np.cos(angles), np.sin(angles)), axis=1)
+
+    return {
+        "color": colors(rng, color, count), "radius": radii,
+        "position": positions, "velocity": velocities * speeds[:, None],
+        "density": sample(rng, density, count),
+    }
+
+
+def fill(
+        balls: world.World, count: int, limits: tuple[float, float],
+        **distributions: Any
+    ) -> None:
+    """adds count Balls spawned (see spawn) into the given World, without
+    overlap among themselves or with the Balls already in it"""
+
+    occupied = balls.position, balls.radius
+    balls.extend(**spawn(count, limits, occupied=occupied, **distributions))
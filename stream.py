@@ -0,0 +1,516 @@
+"""Live Stream of the Collision Simulator
+
+Serves the Balls and the metrics of a running Simulator (headless or not) to
+any number of dashboards, over WebSockets on localhost (see Server):
+
+    python -m collisions_sim run scenario.json --stream 8765
+    python -m stream watch --port 8765
+
+Every message is a frame: a header, its metrics (as JSON) and the Balls (at
+most LIMIT of them), either as a key frame or as the changes since the last
+frame sent to the same dashboard (see encode and Decoder)
+"""
+
+from typing import Any
+import numpy as np
+import threading
+import argparse
+import asyncio
+import hashlib
+import base64
+import socket
+import struct
+import json
+import time
+import os
+
+
+# Address of the Server, which only listens on localhost
+HOST: str = "127.0.0.1"
+PORT: int = 8765
+
+# Most Balls sent in a frame, larger scenes are sampled down to about as many
+LIMIT: int = 2000
+
+# Least time (s) between two frames sent, the frames in between are skipped
+INTERVAL: float = 1 / 30
+
+# Number of frames that may wait to be sent to a dashboard, the rest are
+# dropped (for that dashboard alone)
+FRAMES: int = 4
+
+# Bytes buffered (by the system) for every dashboard, so that slow ones fill
+# their queues (and drop frames) soon, rather than fall ever further behind
+BUFFER: int = 1 << 16
+
+# Kinds of frames: all the Balls sampled, or the changes of their positions
+KEY: int = 0
+DELTA: int = 1
+
+# Positions and radii are sent in steps of 1 / SCALE of the Box
+SCALE: int = 65535
+
+# Header of every frame: kind, number of the frame, number of Balls, number
+# of Balls sent, lower and upper limits of the Box, size of the metrics
+HEADER = struct.Struct("<BQIIffI")
+
+# Appended to the key of the opening handshake of a WebSocket (RFC 6455)
+GUID: bytes = b"258EAFA5-E914-47DA-95CA-C5AB0DC85B11"
+
+# Opcodes of the messages of a WebSocket
+BINARY: int = 0x2
+CLOSE: int = 0x8
+
+
+class Frame:
+    """
+    represents the Balls (sampled down, see sample) and the metrics of a frame
+    taken on the thread of the physics, to be encoded on that of the Server
+    attributes:
+        self.frame: number of the frame (e.g. the steps run so far)
+        self.count: number of Balls in the World
+        self.ids, self.color, self.radius, self.position: the columns of the
+            Balls sent (see world.FIELDS)
+        self.limits: lower and upper limits (i.e. positions of the Walls)
+        self.metrics: the metrics of the frame, by name
+    """
+
+    def __init__(
+            self, balls: Any, frame: int, limits: tuple[float, float],
+            metrics: dict[str, Any], limit: int = LIMIT
+        ) -> None:
+        rows = sample(balls.ids, limit)
+        self.frame, self.count = frame, len(balls)
+        self.ids, self.color = balls.ids[rows], balls.color[rows]
+        self.radius, self.position = balls.radius[rows], balls.position[rows]
+        self.limits, self.metrics = limits, metrics
+
+
+def sample(ids: np.ndarray, limit: int = LIMIT) -> np.ndarray:
+    """returns the rows of the Balls sent in a frame, by their ids: all of
+    them, or those of ids multiple of a stride, so that the same Balls keep
+    being sent (and changes can be sent) as long as the number of Balls does
+    not change, however their rows are ordered"""
+
+    rows = np.argsort(ids, kind="stable")
+    if len(ids) <= limit:
+        return rows
+    stride = -(-len(ids) // limit)
+    return rows[ids[rows] % stride == 0][:limit]
+
+
+def encode(
+        frame: Frame, previous: tuple[np.ndarray, np.ndarray]|None = None
+    ) -> tuple[bytes, tuple[np.ndarray, np.ndarray]]:
+    """returns the message of the frame, and the state it leaves a dashboard
+    in (ids and positions of the Balls sent), to be given as previous for the
+    next frame
+    the frame is sent as the changes of the positions since previous (moved
+    rows and steps, as int16), or as a key frame (ids as uint32, positions and
+    radii as uint16, colors as uint8) if the Balls sent changed, or moved too
+    far, or if there is no previous state
+    Balls outside the Box (e.g. escaped) are sent on its edges"""
+
+    low, high = frame.limits
+    step = (high - low) / SCALE
+    position = np.rint((frame.position - low) / step)
+    position = np.clip(position, 0, SCALE).astype("<u2")
+    metrics = json.dumps(frame.metrics, separators=(",", ":")).encode()
+
+    kind, body = KEY, ()
+    if previous is not None and np.array_equal(previous[0], frame.ids):
+        change = position.astype(np.int32) - previous[1]
+        moved = np.flatnonzero(change.any(axis=1))
+        change = change[moved]
+        if np.abs(change).max(initial=0) <= np.iinfo(np.int16).max:
+            kind = DELTA
+            body = (
+                np.array([len(moved)], "<u4"), moved.astype("<u4"),
+                change.astype("<i2")
+            )
+
+    if kind == KEY:
+        radius = np.clip(np.rint(frame.radius / step), 0, SCALE)
+        body = (
+            frame.ids.astype("<u4"), position, radius.astype("<u2"),
+            frame.color.astype(np.uint8)
+        )
+
+    header = HEADER.pack(
+        kind, frame.frame, frame.count, len(frame.ids), low, high,
+        len(metrics)
+    )
+    message = b"".join((
+        header, metrics, *(np.ascontiguousarray(part).data for part in body)
+    ))
+    return message, (frame.ids, position)
+
+
+class Decoder:
+    """
+    represents the Balls (and metrics) seen by a dashboard, as updated by the
+    messages of the Server in order (see encode)
+    attributes:
+        self.kind: kind of the last frame, KEY or DELTA
+        self.frame: number of the last frame
+        self.count: number of Balls in the World
+        self.ids, self.color, self.radius, self.position: the columns of the
+            Balls sent, positions and radii in the units of the World
+        self.limits: lower and upper limits (i.e. positions of the Walls)
+        self.metrics: the metrics of the last frame, by name
+        self.steps: positions of the Balls, in steps of 1 / SCALE of the Box
+    """
+
+    def __init__(self) -> None:
+        self.kind = self.frame = self.count = 0
+        self.ids = np.empty(0, np.uint32)
+        self.color = np.empty((0, 3), np.uint8)
+        self.radius = np.empty(0)
+        self.position = np.empty((0, 2))
+        self.limits, self.metrics = (0.0, 1.0), {}
+        self.steps = np.empty((0, 2), np.int32)
+
+    def update(self, message: bytes) -> None:
+        """applies the message of a frame"""
+
+        kind, frame, count, sent, low, high, size = HEADER.unpack_from(message)
+        offset = HEADER.size + size
+        metrics = json.loads(message[HEADER.size:offset])
+
+        if kind == KEY:
+            parts = (("<u4", (sent,)), ("<u2", (sent, 2)), ("<u2", (sent,)))
+            columns = []
+            for dtype, shape in parts:
+                column = np.frombuffer(
+                    message, dtype, int(np.prod(shape)), offset
+                )
+                columns.append(column.reshape(shape))
+                offset += column.nbytes
+            ids, steps, radius = columns
+            self.color = np.frombuffer(
+                message, np.uint8, 3 * sent, offset
+            ).reshape(sent, 3)
+            self.ids, self.steps = ids, steps.astype(np.int32)
+            self.radius = radius * ((high - low) / SCALE)
+        elif kind == DELTA:
+            moved = int(np.frombuffer(message, "<u4", 1, offset)[0])
+            rows = np.frombuffer(message, "<u4", moved, offset + 4)
+            change = np.frombuffer(
+                message, "<i2", 2 * moved, offset + 4 + rows.nbytes
+            ).reshape(moved, 2)
+            self.steps[rows] += change
+        else:
+            raise ValueError(f"unknown kind of frame {kind}")
+
+        self.kind, self.frame, self.count = kind, frame, count
+        self.limits, self.metrics = (low, high), metrics
+        self.position = low + self.steps * ((high - low) / SCALE)
+
+
+def header(size: int, opcode: int = BINARY) -> bytes:
+    """returns the header of a (final, unmasked) message of a WebSocket of
+    the given size, as sent by a server"""
+
+    if size < 126:
+        return struct.pack("!BB", 0x80 | opcode, size)
+    if size < 1 << 16:
+        return struct.pack("!BBH", 0x80 | opcode, 126, size)
+    return struct.pack("!BBQ", 0x80 | opcode, 127, size)
+
+
+def accept(key: str) -> bytes:
+    """returns the answer to the key of the opening handshake of a WebSocket"""
+
+    return base64.b64encode(hashlib.sha1(key.encode() + GUID).digest())
+
+
+async def handshake(
+        reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ) -> bool:
+    """answers the opening handshake of a WebSocket
+    returns whether the request was one (it is refused otherwise)"""
+
+    request = (await reader.readuntil(b"\r\n\r\n")).decode("latin-1")
+    headers = {}
+    for line in request.split("\r\n")[1:]:
+        name, _, value = line.partition(":")
+        headers[name.strip().lower()] = value.strip()
+
+    key = headers.get("sec-websocket-key")
+    if key is None or headers.get("upgrade", "").lower() != "websocket":
+        writer.write(b"HTTP/1.1 400 Bad Request\r\nContent-Length: 0\r\n\r\n")
+        return False
+
+    writer.write(
+        b"HTTP/1.1 101 Switching Protocols\r\nUpgrade: websocket\r\n"
+        b"Connection: Upgrade\r\nSec-WebSocket-Accept: " + accept(key)
+        + b"\r\n\r\n"
+    )
+    return True
+
+
+async def receive(reader: asyncio.StreamReader) -> tuple[int, bytes]:
+    """returns the opcode and payload of the next message of a WebSocket"""
+
+    first, second = await reader.readexactly(2)
+    size = second & 0x7F
+    if size == 126:
+        size = struct.unpack("!H", await reader.readexactly(2))[0]
+    elif size == 127:
+        size = struct.unpack("!Q", await reader.readexactly(8))[0]
+    mask = await reader.readexactly(4) if second & 0x80 else bytes(4)
+    payload = await reader.readexactly(size)
+    payload = bytes(byte ^ mask[i % 4] for i, byte in enumerate(payload))
+    return first & 0x0F, payload
+
+
+class Server:
+    """
+    represents a WebSocket server on localhost streaming the frames of a
+    running Simulator to any number of dashboards, which never blocks it
+    frames are handed to the thread of the event loop of the Server, and
+    queued for every dashboard through a bounded queue, dropping the frames
+    that do not fit in it, so that slow dashboards skip frames instead of
+    holding up the Simulator (or the other dashboards)
+    attributes:
+        self.limits: lower and upper limits (i.e. positions of the Walls)
+        self.host, self.port: address listened on (port 0 picks a free one)
+        self.limit: most Balls sent in a frame (see sample)
+        self.interval: least time (s) between two frames sent
+        self.frames: number of frames that may wait for every dashboard
+        self.clients: the frames waiting for every dashboard connected
+        self.tasks: the tasks serving the dashboards connected
+        self.last: time (time.perf_counter) at which the last frame was sent
+        self.sent: number of frames sent so far (to all dashboards)
+        self.dropped: number of frames dropped so far (for all dashboards)
+        self.loop: the event loop of the Server, once started
+        self.stopped: set (on the loop) to stop the Server
+        self.thread: the thread running the loop, once started
+    """
+
+    def __init__(
+            self, limits: tuple[float, float], host: str = HOST,
+            port: int = PORT, limit: int = LIMIT, interval: float = INTERVAL,
+            frames: int = FRAMES
+        ) -> None:
+        self.limits, self.host, self.port = limits, host, port
+        self.limit, self.interval, self.frames = limit, interval, frames
+        self.clients: set[asyncio.Queue[Frame]] = set()
+        self.tasks: set[asyncio.Task] = set()
+        self.last = -float("inf")
+        self.sent = self.dropped = 0
+        self.loop: asyncio.AbstractEventLoop|None = None
+        self.stopped: asyncio.Event|None = None
+        self.thread: threading.Thread|None = None
+
+    def __enter__(self) -> "Server":
+        self.start()
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+    def start(self) -> None:
+        """starts serving on a background thread, once listening"""
+
+        listener = socket.create_server((self.host, self.port))
+        self.port = listener.getsockname()[1]
+        ready = threading.Event()
+        self.thread = threading.Thread(
+            target=asyncio.run, args=(self.serve(listener, ready),),
+            daemon=True
+        )
+        self.thread.start()
+        ready.wait()
+
+    def close(self) -> None:
+        """disconnects the dashboards and stops the thread"""
+
+        if self.thread is not None:
+            self.loop.call_soon_threadsafe(self.stopped.set)
+            self.thread.join()
+            self.thread = None
+
+    def send(
+            self, balls: Any, frame: int, metrics: dict[str, Any]|None = None
+        ) -> None:
+        """hands a frame of the Balls (a world.World or a physics.Snapshot)
+        and its metrics to the dashboards, without waiting for them
+        does nothing if no dashboard is connected, or if the last frame was
+        sent less than interval ago"""
+
+        now = time.perf_counter()
+        if not self.clients or now - self.last < self.interval:
+            return
+
+        self.last = now
+        frame = Frame(balls, frame, self.limits, metrics or {}, self.limit)
+        self.loop.call_soon_threadsafe(self.broadcast, frame)
+
+    def broadcast(self, frame: Frame) -> None:
+        """queues the frame for every dashboard, on the loop
+        drops it for those still busy with earlier frames"""
+
+        for queue in self.clients:
+            try:
+                queue.put_nowait(frame)
+            except asyncio.QueueFull:
+                self.dropped += 1
+
+    async def serve(
+            self, listener: socket.socket, ready: threading.Event
+        ) -> None:
+        """serves the dashboards until stopped, on the loop"""
+
+        self.loop, self.stopped = asyncio.get_running_loop(), asyncio.Event()
+        server = await asyncio.start_server(self.connect, sock=listener)
+        ready.set()
+
+        async with server:
+            await self.stopped.wait()
+            for task in self.tasks:
+                task.cancel()
+            await asyncio.gather(*self.tasks, return_exceptions=True)
+
+    async def connect(
+            self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+        ) -> None:
+        """serves a dashboard until it disconnects (or the Server stops)"""
+
+        task = asyncio.current_task()
+        self.tasks.add(task)
+        connection = writer.get_extra_info("socket")
+        connection.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, BUFFER)
+        writer.transport.set_write_buffer_limits(0)
+        queue: asyncio.Queue[Frame] = asyncio.Queue(self.frames)
+        try:
+            if not await handshake(reader, writer):
+                return
+
+            self.clients.add(queue)
+            listening = asyncio.ensure_future(self.listen(reader))
+            streaming = asyncio.ensure_future(self.stream(queue, writer))
+            try:
+                await asyncio.wait(
+                    (listening, streaming),
+                    return_when=asyncio.FIRST_COMPLETED
+                )
+            finally:
+                listening.cancel()
+                streaming.cancel()
+            writer.write(header(0, CLOSE))
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        except asyncio.CancelledError:
+            # the Server stopped: frames still buffered for slow dashboards
+            # are dropped, rather than waited for
+            writer.transport.abort()
+        finally:
+            self.clients.discard(queue)
+            self.tasks.discard(task)
+            writer.close()
+
+    async def listen(self, reader: asyncio.StreamReader) -> None:
+        """ignores the messages of a dashboard until it closes the WebSocket
+        (or disconnects)"""
+
+        try:
+            while (await receive(reader))[0] != CLOSE:
+                pass
+        except (ConnectionError, asyncio.IncompleteReadError):
+            return
+
+    async def stream(
+            self, queue: asyncio.Queue[Frame], writer: asyncio.StreamWriter
+        ) -> None:
+        """sends the frames queued for a dashboard, as changes since the last
+        frame sent to it where possible (see encode), until it disconnects"""
+
+        state = None
+        try:
+            while True:
+                frame = await queue.get()
+                message, state = encode(frame, state)
+                writer.write(header(len(message)) + message)
+                await writer.drain()
+                self.sent += 1
+        except ConnectionError:
+            return
+
+
+def read(file) -> tuple[int, bytes]:
+    """returns the opcode and payload of the next (unmasked) message of a
+    WebSocket, read from the file of its socket, as sent by a server
+    a closed socket reads as a message closing the WebSocket"""
+
+    start = file.read(2)
+    if len(start) < 2:
+        return CLOSE, b""
+
+    first, second = start
+    size = second & 0x7F
+    if size == 126:
+        size = struct.unpack("!H", file.read(2))[0]
+    elif size == 127:
+        size = struct.unpack("!Q", file.read(8))[0]
+    payload = file.read(size)
+    if len(payload) < size:
+        return CLOSE, b""
+    return first & 0x0F, payload
+
+
+def watch(host: str = HOST, port: int = PORT, frames: int|None = None) -> None:
+    """connects to a Server as a dashboard and prints a line for every frame
+    received (or for the given number of frames)"""
+
+    with socket.create_connection((host, port)) as connection:
+        key = base64.b64encode(os.urandom(16))
+        connection.sendall(
+            b"GET / HTTP/1.1\r\nHost: " + f"{host}:{port}".encode()
+            + b"\r\nUpgrade: websocket\r\nConnection: Upgrade\r\n"
+            b"Sec-WebSocket-Key: " + key
+            + b"\r\nSec-WebSocket-Version: 13\r\n\r\n"
+        )
+        file = connection.makefile("rb")
+        status = file.readline()
+        if b" 101 " not in status:
+            raise ConnectionError(f"not a WebSocket: {status!r}")
+        while file.readline() not in (b"\r\n", b""):
+            continue
+
+        decoder, received = Decoder(), 0
+        while frames is None or received < frames:
+            opcode, message = read(file)
+            if opcode == CLOSE:
+                break
+            decoder.update(message)
+            received += 1
+            kind = "key" if decoder.kind == KEY else "delta"
+            print(
+                f"frame {decoder.frame}: {decoder.count} Balls "
+                f"({len(decoder.ids)} sent, {kind}, {len(message)} bytes) "
+                f"{json.dumps(decoder.metrics)}"
+            )
+
+
+def main(argv: list[str]|None = None) -> None:
+    """__main__ function"""
+
+    parser = argparse.ArgumentParser(prog="stream", description=__doc__)
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("watch", help="print the frames of a run")
+    command.add_argument("--host", default=HOST)
+    command.add_argument("--port", type=int, default=PORT)
+    command.add_argument("--frames", type=int, help="stop after this many")
+
+    args = parser.parse_args(argv)
+    try:
+        watch(args.host, args.port, args.frames)
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,209 @@
+"""Parameter Sweeps of the Collision Simulator
+
+Runs a headless scenario (see collisions_sim.py) once for every combination
+of the given planets (see gravitation.g), coefficients of restitution,
+directions of gravity and seeds (of the Balls spawned, see spawner.py), on a
+pool of processes:
+
+    python -m sweep scenario.json --planets EARTH MOON --e 0.5 1 --seeds 0 1
+
+The metrics of every finished case are appended to the results file (JSON
+lines) as soon as it finishes, keyed by a hash of its parameters, so that a
+sweep started again skips the cases it already has
+"""
+
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Any, Iterator
+import collisions_sim
+import gravitation
+import kernels
+import itertools
+import argparse
+import scenario
+import solver
+import hashlib
+import json
+import time
+import os
+
+# pygame is only used for its Vectors here, so keep quiet about it
+os.environ.setdefault("PYGAME_HIDE_SUPPORT_PROMPT", "1")
+
+
+# Defaults of the sweep
+STEPS: int = 1000
+OUTPUT: str = "sweep.jsonl"
+
+
+def key(data: dict[str, Any], params: dict[str, Any], steps: int) -> str:
+    """returns the hash identifying a case: the scenario, its parameters and
+    the number of steps it is run for"""
+
+    case = {"scenario": data, "params": params, "steps": steps}
+    encoded = json.dumps(case, sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(encoded.encode()).hexdigest()[:16]
+
+
+def cases(
+        planets: list[str|None], es: list[float|None],
+        directions: list[str|None], seeds: list[int|None]
+    ) -> Iterator[dict[str, Any]]:
+    """yields the parameters of every combination of the given values
+    None keeps the value of the scenario"""
+
+    for planet, e, direction, seed in itertools.product(
+            planets, es, directions, seeds
+        ):
+        params = {
+            "planet": planet, "e": e, "direction": direction, "seed": seed
+        }
+        yield {
+            name: value for name, value in params.items() if value is not None
+        }
+
+
+def apply(data: dict[str, Any], params: dict[str, Any]) -> dict[str, Any]:
+    """returns the scenario (as a dict) with the given parameters"""
+
+    data = {**data, **{
+        name: value for name, value in params.items() if name != "seed"
+    }}
+    if "planet" in params:
+        data.pop("g", None)
+    if "seed" in params:
+        if "spawn" not in data:
+            raise ValueError("seeds need Balls to be spawned in the scenario")
+        data["spawn"] = {**data["spawn"], "seed": params["seed"]}
+    return data
+
+
+def energy(balls: "world.World") -> float:
+    """returns the total kinetic energy of the Balls"""
+
+    return float((balls.mass * (balls.velocity**2).sum(axis=1)).sum() / 2)
+
+
+def run(
+        data: dict[str, Any], params: dict[str, Any], steps: int
+    ) -> dict[str, Any]:
+    """runs the scenario with the given parameters for the given number of
+    steps, returns its metrics"""
+
+    setup = scenario.parse(apply(data, params))
+    balls, contacts = setup.build(), solver.Solver()
+    kernels.warm(balls)
+    start, initial = time.perf_counter(), energy(balls)
+
+    walls = pairs = 0
+    for frame in range(steps):
+        records = collisions_sim.step(
+            balls, setup, frame=frame, contacts=contacts
+        )
+        hits = sum(record.wall != -1 for record in records)
+        walls, pairs = walls + hits, pairs + len(records) - hits
+
+    return {
+        "key": key(data, params, steps), "params": params, "steps": steps,
+        "balls": len(balls), "collisions": pairs + walls, "pairs": pairs,
+        "wall_hits": walls, "energy_start": initial, "energy": energy(balls),
+        "digest": balls.digest(), "seconds": time.perf_counter() - start,
+    }
+
+
+def finished(path: str) -> set[str]:
+    """returns the keys of the cases in the results file, if any"""
+
+    if not os.path.exists(path):
+        return set()
+
+    keys = set()
+    with open(path) as file:
+        for line in file:
+            try:
+                keys.add(json.loads(line)["key"])
+            except (ValueError, KeyError):
+                # a line cut short by an interrupted sweep
+                continue
+    return keys
+
+
+def mend(path: str) -> None:
+    """ends the last line of the results file, if it was cut short by an
+    interrupted sweep, so that new results start on lines of their own"""
+
+    if not os.path.exists(path) or not os.path.getsize(path):
+        return
+
+    with open(path, "rb+") as file:
+        file.seek(-1, os.SEEK_END)
+        if file.read(1) != b"\n":
+            file.write(b"\n")
+
+
+def sweep(
+        data: dict[str, Any], grid: list[dict[str, Any]], steps: int = STEPS,
+        output: str = OUTPUT, workers: int|None = None, report: bool = True
+    ) -> int:
+    """runs every case of the grid not yet in the output file on a pool of
+    processes, appending their metrics to it as they finish
+    returns the number of cases run"""
+
+    done = finished(output)
+    todo = [params for params in grid if key(data, params, steps) not in done]
+    if report and len(todo) < len(grid):
+        print(f"skipping {len(grid) - len(todo)} finished cases")
+
+    mend(output)
+    with ProcessPoolExecutor(workers) as pool, open(output, "a") as file:
+        futures = [pool.submit(run, data, params, steps) for params in todo]
+        for future in as_completed(futures):
+            result = future.result()
+            file.write(json.dumps(result) + "\n")
+            file.flush()
+            if report:
+                print(
+                    f"{json.dumps(result['params'])}: {result['collisions']} "
+                    f"collisions, {result['wall_hits']} wall hits, "
+                    f"energy {result['energy']:.6g}"
+                )
+    return len(todo)
+
+
+def main(argv: list[str]|None = None) -> None:
+    """__main__ function"""
+
+    parser = argparse.ArgumentParser(prog="sweep", description=__doc__)
+    parser.add_argument("scenario", help="path to the JSON scenario")
+    parser.add_argument(
+        "--planets", nargs="+", type=str.upper, default=[None],
+        help="planets (see gravitation.g), or ALL of them"
+    )
+    parser.add_argument("--e", nargs="+", type=float, default=[None])
+    parser.add_argument(
+        "--directions", nargs="+", choices=("+y", "-y", "+x", "-x"),
+        default=[None]
+    )
+    parser.add_argument("--seeds", nargs="+", type=int, default=[None])
+    parser.add_argument("--steps", type=int, default=STEPS)
+    parser.add_argument("--workers", type=int, help="number of processes")
+    parser.add_argument("--output", default=OUTPUT)
+    args = parser.parse_args(argv)
+
+    if args.planets == ["ALL"]:
+        args.planets = list(gravitation.g)
+    for planet in args.planets:
+        if planet is not None and planet not in gravitation.g:
+            parser.error(f"unknown planet {planet}")
+    for e in args.e:
+        if e is not None and not 0 <= e <= 1:
+            parser.error(f"e must lie in [0, 1], not {e}")
+
+    with open(args.scenario) as file:
+        data = json.load(file)
+
+    grid = list(cases(args.planets, args.e, args.directions, args.seeds))
+    sweep(data, grid, args.steps, args.output, args.workers)
+
+
+if __name__ == "__main__":
+    main()
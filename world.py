@@ -0,0 +1,727 @@
+from generator import Ball, Color, Point
+from typing import Callable, Iterable, Iterator
+import collisions
+import generator
+import kernels
+import numpy as np
+import hashlib
+import spatial
+import solver
+import math
+
+
+# Columns stored for every Ball: name -> (shape of a row, dtype)
+FIELDS: dict[str, tuple[tuple[int, ...], type]] = {
+    "color": ((3,), np.uint8),
+    "radius": ((), np.float64),
+    "position": ((2,), np.float64),
+    "velocity": ((2,), np.float64),
+    "density": ((), np.float64),
+    "mass": ((), np.float64),
+    "ids": ((), np.int64),
+}
+
+# Columns kept for the Balls along with FIELDS, which are not part of their
+# state (and so are neither saved nor recorded)
+CACHED: dict[str, tuple[tuple[int, ...], type]] = {
+    "cell": ((2,), np.int64),
+    "still": ((), np.int64),
+    "support": ((), np.bool_),
+}
+
+# Columns stored in single precision (and still as a byte) by compact Worlds,
+# which take half the memory, e.g. for runs of a million Balls
+# positions are then kept to about 1e-7 of their size (3e-5 in a Box of 600),
+# and lose as much in every step they move, unless they are accumulated
+COMPACT: dict[str, type] = {
+    "radius": np.float32, "position": np.float32, "velocity": np.float32,
+    "density": np.float32, "mass": np.float32, "still": np.uint8,
+}
+
+# Column kept by compact Worlds accumulating their positions: the part of the
+# position of every Ball lost to rounding it into single precision, which is
+# carried over into the next step, so that small steps do not drift
+RESIDUAL: dict[str, tuple[tuple[int, ...], type]] = {
+    "residual": ((2,), np.float64),
+}
+
+# Speed below which a Ball is still (along with the speed gained from gravity
+# in a step), and number of steps after which a still Ball is put to sleep,
+# once it is supported (see World.handle), e.g. resting on the floor
+SPEED: float = 5.0
+FRAMES: int = 50
+
+
+def column(name: str) -> property:
+    """returns a property viewing the filled rows of the given column"""
+
+    def getter(self: "World") -> np.ndarray:
+        return self.arrays[name][:self.count]
+
+    def setter(self: "World", value: np.ndarray) -> None:
+        self.arrays[name][:self.count] = value
+
+    return property(getter, setter)
+
+
+class BallView:
+    """
+    represents a lightweight view into the row of a Ball stored in a World
+    behaves like a generator.Ball, so that it can be selected and drawn
+    attributes:
+        self.world: the World in which the Ball is stored
+        self.id: stable id of the Ball in the World
+    """
+
+    __slots__ = ("world", "id")
+
+    def __init__(self, world: "World", id: int) -> None:
+        self.world, self.id = world, id
+
+    def __eq__(self, other: object) -> bool:
+        if not isinstance(other, BallView):
+            return NotImplemented
+        return self.world is other.world and self.id == other.id
+
+    def __hash__(self) -> int:
+        return hash((id(self.world), self.id))
+
+    def __repr__(self) -> str:
+        return (
+            f"Ball(color={self.color}, radius={self.radius}, "
+            f"position={self.position!r}, velocity={self.velocity!r}, "
+            f"density={self.density})"
+        )
+
+    @property
+    def row(self) -> int:
+        return self.world.rows[self.id]
+
+    @property
+    def color(self) -> Color:
+        return tuple(self.world.color[self.row].tolist())
+
+    @property
+    def radius(self) -> float:
+        return float(self.world.radius[self.row])
+
+    @property
+    def density(self) -> float:
+        return float(self.world.density[self.row])
+
+    @property
+    def mass(self) -> float:
+        return float(self.world.mass[self.row])
+
+    @property
+    def position(self) -> "pygame.math.Vector2":
+        from pygame.math import Vector2
+        return Vector2(self.world.position[self.row].tolist())
+
+    @position.setter
+    def position(self, value: Point) -> None:
+        row = self.row
+        self.world.position[row] = tuple(value)
+        if self.world.accumulate:
+            self.world.residual[row] = np.subtract(
+                tuple(value), self.world.position[row], dtype=np.float64
+            )
+
+    @property
+    def velocity(self) -> "pygame.math.Vector2":
+        from pygame.math import Vector2
+        return Vector2(self.world.velocity[self.row].tolist())
+
+    @velocity.setter
+    def velocity(self, value: Point) -> None:
+        self.world.velocity[self.row] = tuple(value)
+
+
+class Rows:
+    """
+    represents the row of every Ball of a World by its id, as a dict would,
+    but stored as an array indexed by the ids (which are given out in order),
+    taking a few bytes per Ball instead of a hundred
+    attributes:
+        self.array: row of every id, -1 for the ids of no Ball
+    """
+
+    def __init__(self) -> None:
+        self.array = np.full(0, -1, dtype=np.int64)
+
+    def __getitem__(self, id: int) -> int:
+        if not 0 <= id < len(self.array) or self.array[id] < 0:
+            raise KeyError(id)
+        return int(self.array[id])
+
+    def __setitem__(self, id: int, row: int) -> None:
+        self.reserve(id + 1)
+        self.array[id] = row
+
+    def reserve(self, size: int) -> None:
+        """grows the array (at least doubling it) to hold ids below size"""
+
+        if size > len(self.array):
+            grown = np.full(max(size, 2*len(self.array)), -1, dtype=np.int64)
+            grown[:len(self.array)] = self.array
+            self.array = grown
+
+    def pop(self, id: int) -> int:
+        """forgets the given id, returns its row"""
+
+        row, self.array[id] = self[id], -1
+        return row
+
+    def update(self, ids: np.ndarray, rows: np.ndarray) -> None:
+        """sets the rows of many ids at once"""
+
+        if len(ids):
+            self.reserve(int(ids.max()) + 1)
+            self.array[ids] = rows
+
+    def clear(self) -> None:
+        """forgets all the ids"""
+
+        self.array[:] = -1
+
+
+class World:
+    """
+    represents all the Balls of the simulation as a structure of contiguous
+    arrays (one row per Ball), so that they are updated in batched operations
+    behaves like a list of BallViews
+    attributes:
+        self.arrays: the underlying arrays, with spare rows at their end
+        self.count: number of Balls in the World
+        self.rows: row of every Ball, by its id (see Rows)
+        self.next_id: id given to the next Ball added to the World
+        self.index: the spatial.Index of the Balls, refreshed before queries
+        self.sweep: the collisions.Sweep of the Balls, so that the order it
+            keeps from step to step is only that of this World
+        self.color, self.radius, self.position, self.velocity, self.density,
+        self.mass, self.ids: the filled rows of the respective arrays
+        self.cell: cell of the Index in which every Ball was last placed
+        self.still: number of steps (up to FRAMES) for which every Ball has
+            been still, the Ball is asleep once it reaches FRAMES, which it
+            only does in a step in which it is supported
+        self.support: whether every Ball hit a Wall, or touched a Ball asleep,
+            in the last step (see handle)
+        self.compact: whether the columns of COMPACT are single precision
+        self.accumulate: whether the residual of the positions is kept
+        self.residual: the part of every position lost to single precision,
+            only kept if self.accumulate (see RESIDUAL)
+    """
+
+    color = column("color")
+    radius = column("radius")
+    position = column("position")
+    velocity = column("velocity")
+    density = column("density")
+    mass = column("mass")
+    ids = column("ids")
+    cell = column("cell")
+    still = column("still")
+    support = column("support")
+    residual = column("residual")
+
+    def __init__(
+            self, balls: Iterable[Ball] = (), capacity: int = 64,
+            compact: bool = False, accumulate: bool = False
+        ) -> None:
+        if accumulate and not compact:
+            raise ValueError("only compact Worlds accumulate their positions")
+
+        columns = {**FIELDS, **CACHED, **(RESIDUAL if accumulate else {})}
+        dtypes = COMPACT if compact else {}
+        self.arrays = {
+            name: np.zeros((capacity, *shape), dtype=dtypes.get(name, dtype))
+            for name, (shape, dtype) in columns.items()
+        }
+        self.compact, self.accumulate = compact, accumulate
+        self.count, self.next_id = 0, 0
+        self.rows = Rows()
+        self.index = spatial.Index()
+        self.sweep = collisions.Sweep()
+
+        for ball in balls:
+            self.append(ball)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __iter__(self) -> Iterator[BallView]:
+        return (BallView(self, id) for id in self.ids.tolist())
+
+    def __getitem__(self, row: int) -> BallView:
+        return BallView(self, int(self.ids[row]))
+
+    def __repr__(self) -> str:
+        return repr(list(self))
+
+    def reserve(self, count: int) -> None:
+        """grows the arrays (at least doubling them) to hold count Balls"""
+
+        capacity = len(self.arrays["ids"])
+        if count <= capacity:
+            return
+
+        capacity = max(count, 2*capacity)
+        for name, array in self.arrays.items():
+            grown = np.zeros((capacity, *array.shape[1:]), dtype=array.dtype)
+            grown[:self.count] = array[:self.count]
+            self.arrays[name] = grown
+
+    def append(self, ball: Ball) -> BallView:
+        """copies the given Ball into a new row
+        returns a view into the row of the Ball"""
+
+        self.reserve(self.count + 1)
+        row, id = self.count, self.next_id
+        self.count, self.next_id = self.count + 1, self.next_id + 1
+
+        self.color[row] = ball.color
+        self.radius[row] = ball.radius
+        self.position[row] = tuple(ball.position)
+        self.velocity[row] = tuple(ball.velocity)
+        self.density[row] = ball.density
+        self.mass[row] = generator.mass(ball.radius, ball.density)
+        self.ids[row] = id
+        self.cell[row] = spatial.UNPLACED
+        self.still[row] = 0
+        self.support[row] = False
+        self.rows[id] = row
+        if self.accumulate:
+            self.residual[row] = np.subtract(
+                tuple(ball.position), self.position[row], dtype=np.float64
+            )
+
+        return BallView(self, id)
+
+    def extend(
+            self, color: np.ndarray, radius: np.ndarray, position: np.ndarray,
+            velocity: np.ndarray, density: np.ndarray,
+            ids: np.ndarray|None = None
+        ) -> None:
+        """copies many Balls, given as columns, into new rows at once
+        ids are given to the new Balls, if not given (e.g. when replaying)"""
+
+        count = len(radius)
+        if not count:
+            return
+
+        if ids is None:
+            ids = np.arange(self.next_id, self.next_id + count)
+
+        start, stop = self.count, self.count + count
+        self.reserve(stop)
+        self.count = stop
+
+        self.color[start:] = color
+        self.radius[start:] = radius
+        self.position[start:] = position
+        self.velocity[start:] = velocity
+        self.density[start:] = density
+        self.ids[start:] = ids
+        self.cell[start:] = spatial.UNPLACED
+        self.still[start:] = 0
+        self.support[start:] = False
+
+        if self.accumulate:
+            self.residual[start:] = np.subtract(
+                position, self.position[start:], dtype=np.float64
+            )
+
+        radius, density = self.radius[start:], self.density[start:]
+        self.mass[start:] = generator.mass(radius, density)
+
+        self.next_id = max(self.next_id, int(np.max(ids)) + 1)
+        self.rows.update(self.ids[start:], np.arange(start, stop))
+
+    def remove(self, ball: BallView) -> None:
+        """removes the row of the given Ball, moving the last row into it
+        the Balls around it are left asleep, see discard to wake them"""
+
+        row, last = self.rows.pop(ball.id), self.count - 1
+        self.index.discard(ball.id, tuple(self.cell[row].tolist()))
+        if row != last:
+            for array in self.arrays.values():
+                array[row] = array[last]
+            self.rows[int(self.ids[row])] = row
+        self.count = last
+
+    def discard(self, balls: Iterable[BallView]) -> None:
+        """removes the rows of all the given Balls at once, moving the rows
+        left (in order) over them
+        wakes the Balls around them first, which may have been resting on
+        them, all at once (within the rectangle bounding all of them)"""
+
+        ids = np.array([ball.id for ball in balls], dtype=np.int64)
+        rows = np.unique(self.rows.array[ids])
+        if not len(rows):
+            return
+
+        self.refresh()
+        position, radius = self.position[rows], self.radius[rows, None]
+        low = (position - radius).min(axis=0).tolist()
+        high = (position + radius).max(axis=0).tolist()
+        self.still[self.near(low, high)] = 0
+
+        ids = self.ids[rows]
+        self.index.remove(ids, self.cell[rows])
+        self.rows.array[ids] = -1
+
+        keep = np.ones(self.count, dtype=bool)
+        keep[rows] = False
+        count = self.count - len(rows)
+        for array in self.arrays.values():
+            array[:count] = array[:self.count][keep]
+        self.count = count
+        self.rows.update(self.ids, np.arange(count))
+
+    def clear(self) -> None:
+        """removes all the Balls"""
+
+        self.count = 0
+        self.rows.clear()
+        self.index.clear()
+
+    def refresh(self) -> None:
+        """moves the Balls that left their cells into their current cells of
+        the Index, e.g. before it is queried
+        the cells are made as wide as the largest Ball again (placing every
+        Ball anew) once they are more than twice as wide or narrow"""
+
+        size = 2 * float(self.radius.max(initial=0.0)) or collisions.CELL
+        if not size/2 <= self.index.size <= 2*size:
+            self.index = spatial.Index(size)
+            self.cell = spatial.UNPLACED
+        self.index.refresh(self.ids, self.position, self.cell)
+
+    def near(self, low: Point, high: Point) -> np.ndarray:
+        """returns the rows of the Balls whose centres lie in the cells of the
+        Index within reach (of the largest Ball) of the rectangle from low to
+        high, in sorted order"""
+
+        ids = self.index.near(low, high, float(self.radius.max()))
+        return np.sort(self.rows.array[np.array(ids, dtype=np.int64)])
+
+    def at(self, point: Point) -> BallView|None:
+        """returns the Ball on which point lies, if any, else None
+        same as collisions.select, i.e. the first such Ball (by row)"""
+
+        if not self.count:
+            return None
+
+        self.refresh()
+        rows = self.near(point, point)
+        d2 = ((self.position[rows] - point)**2).sum(axis=1)
+        near = rows[d2 <= self.radius[rows]**2 * collisions.SLACK]
+
+        position, radius = self.position, self.radius
+        for row in near.tolist():
+            if math.dist(point, position[row].tolist()) <= radius[row]:
+                return self[row]
+        return None
+
+    def within(self, low: Point, high: Point) -> list[BallView]:
+        """returns the Balls lying (at least partly) in the rectangle from low
+        to high, in order of their rows"""
+
+        if not self.count:
+            return []
+
+        self.refresh()
+        rows = self.near(low, high)
+        position, radius = self.position[rows], self.radius[rows]
+        gap = position - np.clip(position, low, high)
+        inside = (gap**2).sum(axis=1) <= radius**2
+        return [self[row] for row in rows[inside].tolist()]
+
+    def canonical(self) -> np.ndarray:
+        """returns the rows of the Balls in canonical order, i.e. sorted by
+        their positions, velocities, radii, densities and colors, which does
+        not depend on the order in which they were added (or removed)"""
+
+        return collisions.canonical(
+            self.precise(), self.velocity, self.radius, self.density,
+            self.color
+        )
+
+    def digest(self) -> str:
+        """returns a hash of the state of the Balls (all of their columns but
+        ids and masses) in canonical order, the same for bit-identical states
+        however the Balls were added"""
+
+        order = self.canonical()
+        hash = hashlib.blake2b(digest_size=16)
+        for column in (
+                self.precise(), self.velocity, self.radius, self.density,
+                self.color
+            ):
+            hash.update(np.ascontiguousarray(column[order]).data)
+        return hash.hexdigest()
+
+    def asleep(self) -> np.ndarray:
+        """returns whether every Ball is asleep"""
+
+        return self.still >= FRAMES
+
+    def wake(self) -> None:
+        """wakes all the Balls, e.g. when gravity changes"""
+
+        self.still = 0
+
+    def update(
+            self, dt: float, gravity: bool, g: float, dirn: str,
+            sleep: bool = False
+        ) -> None:
+        """updates the positions (and velocities) of the Balls according to
+        their velocities and gravitational acceleration, if any
+        same as generator.Ball.update, but for all the rows at once
+        if sleep is True, the Balls asleep are left where they are, and those
+        still for FRAMES steps are put to sleep, once supported (see handle)"""
+
+        rows = slice(None)
+        if sleep:
+            rows = np.flatnonzero(~self.asleep())
+            if len(rows) == self.count:
+                rows = slice(None)
+
+        if gravity:
+            self.accelerate(dt, g, dirn, rows)
+        if self.accumulate:
+            self.move(
+                np.multiply(self.velocity[rows], dt, dtype=np.float64), rows
+            )
+        else:
+            self.position[rows] += self.velocity[rows] * dt
+
+        if sleep:
+            self.settle(SPEED + (abs(g)*dt if gravity else 0.0))
+
+    def settle(self, speed: float) -> None:
+        """counts the steps for which every Ball has been slower than speed,
+        and stops the Balls that fell asleep
+        Balls only fall asleep in a step in which they are supported, so that
+        those slow but unsupported, e.g. at the top of their flight, or
+        drifting without gravity, are never stopped"""
+
+        slow = (self.velocity**2).sum(axis=1) <= speed**2
+        limit = np.where(self.support | self.asleep(), FRAMES, FRAMES - 1)
+        self.still = np.where(slow, np.minimum(self.still + 1, limit), 0)
+        self.velocity[self.asleep()] = 0.0
+
+    def accelerate(
+            self, dt: float, g: float, dirn: str,
+            rows: slice|np.ndarray = slice(None)
+        ) -> None:
+        """updates the positions and velocities of the Balls (in the given
+        rows) according to gravitational acceleration g in direction dirn,
+        over time dt"""
+
+        (sign, axis), at, at2 = dirn, g*dt, 1/2*g*dt**2
+        k = "xy".index(axis)
+        if self.accumulate:
+            self.move(at2 if sign == "+" else -at2, rows, k)
+        else:
+            self.position[rows, k] += at2 if sign == "+" else -at2
+        self.velocity[rows, k] += at if sign == "+" else -at
+
+    def move(
+            self, delta: np.ndarray|float,
+            rows: slice|np.ndarray = slice(None), axis: slice|int = slice(None)
+        ) -> None:
+        """moves the Balls (in the given rows, along the given axis) by delta,
+        in double precision, keeping what is lost to rounding the positions
+        into single precision in the residual (see RESIDUAL)"""
+
+        exact = self.position[rows, axis] + self.residual[rows, axis] + delta
+        self.position[rows, axis] = exact
+        self.residual[rows, axis] = exact - self.position[rows, axis]
+
+    def precise(self) -> np.ndarray:
+        """returns the positions of the Balls, along with their residuals if
+        they are accumulated (see RESIDUAL)"""
+
+        if self.accumulate:
+            return self.position + self.residual
+        return self.position
+
+    def collide(self, i: int, j: int, e: float) -> None:
+        """updates the velocities of the Balls in rows i and j, colliding with
+        coefficient of restitution e"""
+
+        # Vector2 divides by multiplying with the reciprocal, do the same
+        mass, velocity = self.mass, self.velocity
+        m1, m2 = float(mass[i]), float(mass[j])
+        (u1x, u1y), (u2x, u2y) = velocity[i].tolist(), velocity[j].tolist()
+        inverse = 1 / (m1 + m2)
+        velocity[i] = (
+            ((m1 - e*m2)*u1x + (1 + e)*m2*u2x) * inverse,
+            ((m1 - e*m2)*u1y + (1 + e)*m2*u2y) * inverse,
+        )
+        velocity[j] = (
+            ((1 + e)*m1*u1x + (m2 - e*m1)*u2x) * inverse,
+            ((1 + e)*m1*u1y + (m2 - e*m1)*u2y) * inverse,
+        )
+
+    def pairs(
+            self, broad: str|collisions.BroadPhase = collisions.BROAD_PHASE,
+            rows: np.ndarray|None = None
+        ) -> list[tuple[int, int]]:
+        """returns the rows (i, j), i < j, of colliding Balls in sorted order
+        broad is the name of a broad phase in collisions.BROAD_PHASES, or a
+        function (like parallel.Engine) with the same signature
+        'sweep' is the Sweep of this World (see self.sweep)
+        if rows (sorted) are given, only the Balls in them are tested"""
+
+        if broad == "sweep":
+            broad = self.sweep
+        elif isinstance(broad, str):
+            broad = collisions.BROAD_PHASES[broad]
+        if rows is None:
+            return broad(self.position, self.radius)
+
+        pairs = broad(self.position[rows], self.radius[rows])
+        rows = rows.tolist()
+        return [(rows[i], rows[j]) for i, j in pairs]
+
+    def around(self, awake: np.ndarray) -> np.ndarray:
+        """returns the rows of the Balls awake, along with those of the Balls
+        asleep which may touch them, i.e. lying in the same or in neighbouring
+        cells (as wide as the largest Ball) of a grid"""
+
+        if not awake.any():
+            return np.flatnonzero(awake)
+
+        size = 2 * float(self.radius.max()) * collisions.SLACK
+        cells = np.floor(self.position / size).astype(np.int64)
+        cells -= cells.min(axis=0) - 1
+
+        # spare columns, so that neighbouring keys never wrap into another row
+        width = int(cells[:, 1].max()) + 2
+        keys = cells[:, 0]*width + cells[:, 1]
+        offsets = np.add.outer(np.arange(-1, 2)*width, np.arange(-1, 2))
+        near = np.unique(keys[awake][:, None] + offsets.ravel())
+        return np.flatnonzero(awake | np.isin(keys, near))
+
+    def resolve(
+            self, pairs: list[tuple[int, int]], e: float, sleep: bool,
+            beep: Callable[[int], None]|None = None, frame: int = 0
+        ) -> list[collisions.Collision]:
+        """collides the Balls of the given pairs of rows in order, in the
+        compiled kernels.resolve, the same as the loop of handle()
+        returns the occurred collisions (of Balls by id) in the given frame"""
+
+        first, second = np.array(pairs, dtype=np.int64).reshape(-1, 2).T
+        collided = kernels.resolve(
+            first, second, self.mass, self.velocity, self.still, e, sleep,
+            FRAMES
+        )
+
+        records, first, second = [], first[collided], second[collided]
+        for i, j, id1, id2 in zip(
+                first.tolist(), second.tolist(), self.ids[first].tolist(),
+                self.ids[second].tolist()
+            ):
+            records.append(collisions.Collision(frame, id1, id2, -1))
+            if beep is not None:
+                beep(collisions.frequency(self[i], self[j]))
+        return records
+
+    def handle(
+            self, limits: tuple[Point], e: float,
+            beep: Callable[[int], None]|None = None,
+            broad: str|collisions.BroadPhase = collisions.BROAD_PHASE,
+            frame: int = 0, sleep: bool = False,
+            solver: "solver.Solver|None" = None, ordered: bool = False
+        ) -> list[collisions.Collision]:
+        """handles collisions of Balls with walls and with one-another
+        updates their velocites according to the collisions
+        beep, if given, is called with the frequency of every collision
+        if sleep is True, the Balls asleep only collide with Balls awake: they
+        are woken by Balls that were not still, and stay put otherwise
+        if solver is given, the contacts are solved by it instead, which also
+        pushes the Balls overlapping apart
+        if ordered is True, the Balls are collided in canonical order (see
+        canonical), so that the result does not depend on their rows
+        the Balls hitting a Wall, or touching a Ball asleep, are marked as
+        supported (see support), which they must be to fall asleep
+        returns the occurred collisions (of Balls by id) in the given frame"""
+
+        records = []
+        lower, upper = limits
+        (x, y), radius, velocity = self.position.T, self.radius, self.velocity
+
+        # Handle Collisions with Walls (Upper, Lower, Left, Right)
+        hits = np.stack((
+            abs(y-lower) <= radius, abs(y-upper) <= radius,
+            abs(x-lower) <= radius, abs(x-upper) <= radius
+        ), axis=1)
+        self.support = hits.any(axis=1)
+        subset = None
+        if sleep and (asleep := self.asleep()).any():
+            hits &= ~asleep[:, None]
+            subset = self.around(~asleep)
+        if solver is None:
+            flips = np.where(hits.reshape(-1, 2, 2).sum(axis=2) % 2, -1.0, 1.0)
+            velocity *= flips[:, ::-1]
+
+        rows, walls = np.nonzero(hits)
+        if ordered:
+            order = self.canonical()
+            rank = np.empty_like(order)
+            rank[order] = np.arange(len(order))
+            by = np.lexsort((walls, rank[rows]))
+            rows, walls = rows[by], walls[by]
+        for row, wall, id in zip(
+                rows.tolist(), walls.tolist(), self.ids[rows].tolist()
+            ):
+            records.append(collisions.Collision(frame, id, -1, wall))
+            if beep is not None:
+                beep(collisions.frequency(self[row]))
+
+        # Handle Collisions with other Balls
+        # positions do not change here, so all the pairs can be found beforehand
+        pairs = self.pairs(broad, subset)
+        if ordered and pairs:
+            pairs = collisions.reorder(pairs, order)
+        if subset is not None and pairs:
+            first, second = np.array(pairs, dtype=np.int64).T
+            self.support[first[asleep[second]]] = True
+            self.support[second[asleep[first]]] = True
+        if kernels.ENABLED and solver is None:
+            sleep = subset is not None
+            return records + self.resolve(pairs, e, sleep, beep, frame)
+
+        ids = self.ids.tolist()
+        if solver is not None:
+            if subset is not None:
+                pairs = [(i, j) for i, j in pairs if not asleep[i] & asleep[j]]
+            else:
+                asleep = None
+            solver.solve(self, pairs, rows, walls, limits, e, asleep)
+            for i, j in pairs:
+                records.append(collisions.Collision(frame, ids[i], ids[j], -1))
+                if beep is not None:
+                    beep(collisions.frequency(self[i], self[j]))
+            return records
+
+        still = self.still
+        for i, j in pairs:
+            if subset is not None and min(still[i], still[j]) >= FRAMES:
+                continue
+
+            records.append(collisions.Collision(frame, ids[i], ids[j], -1))
+            if beep is not None:
+                beep(collisions.frequency(self[i], self[j]))
+
+            self.collide(i, j, e)
+            if subset is not None:
+                for row, other in ((i, j), (j, i)):
+                    if still[row] >= FRAMES and not still[other]:
+                        still[row] = 0
+                    elif still[row] >= FRAMES:
+                        velocity[row] = 0.0
+
+        return records